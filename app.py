@@ -1,16 +1,75 @@
-from flask import Flask, jsonify
-from routes.stock_routes import stock_bp
+import asyncio
+import logging
+import click
+import orjson
+from quart import Quart, jsonify
+from quart.json.provider import DefaultJSONProvider
 from config import Config
+from routes.stock_routes import stock_bp
+from services.cache_store import get_redis_client
+from services.stock_recommendation_service import StockRecommendationService
+
+# 로그 레벨 설정 (DEBUG 모드에서만 요청별 상세 로그 출력, logger는 사용 시점에 조회하므로 import 이후 설정)
+logging.basicConfig(
+    level=logging.DEBUG if Config.DEBUG else logging.INFO,
+    format="%(asctime)s %(levelname)s [%(name)s] %(message)s"
+)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify/request.get_json을 orjson으로 처리 (한글 등 non-ASCII를 escape 없이 UTF-8로 직렬화)"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def create_app(config_object=Config):
+    """
+    Quart(ASGI) 앱 팩토리 (Flask 호환 API, native async view)
+
+    서비스(Chroma 클라이언트, LLM 클라이언트)는 앱을 생성한 프로세스에서 초기화함.
+    chromadb 1.x 클라이언트는 fork 후 사용할 수 없으므로 gunicorn --preload로 실행하지 말 것
+    (worker마다 create_app을 호출하도록 하고, 초기 적재는 `python -m services.vector_store_service`로 먼저 수행).
+    """
+    app = Quart(__name__)
+    app.json = OrjsonProvider(app)
+    app.config.from_object(config_object)
+
+    if not app.config.get('TESTING'):
+        app.extensions['stock_service'] = StockRecommendationService()
+
+    app.register_blueprint(stock_bp, url_prefix='/api')
+
+    @app.route('/health')
+    async def health_check():
+        """헬스 체크 엔드포인트"""
+        return jsonify({'status': 'healthy', 'service': 'KosWave Stock API'}), 200
+
+    # 사용 예: quart --app "app:create_app()" precompute 반도체 2차전지 --file keywords.txt
+    @app.cli.command('precompute', with_appcontext=False)
+    @click.argument('keywords', nargs=-1)
+    @click.option('--file', 'keywords_file', type=click.Path(exists=True), help='키워드 목록 파일 (한 줄에 1개)')
+    def precompute_command(keywords, keywords_file):
+        """인기 키워드 추천 결과를 Batch API로 미리 생성하여 캐시에 적재"""
+        keywords = list(keywords)
+        if keywords_file:
+            with open(keywords_file, 'r', encoding='utf-8') as f:
+                keywords.extend(line.strip() for line in f if line.strip())
+        if not keywords:
+            raise click.UsageError('웜업할 키워드를 인자 또는 --file로 지정하세요.')
+        # CLI 프로세스의 in-proc LRU 캐시는 종료와 함께 사라지므로 서버와 공유하는 Redis가 필요
+        if get_redis_client() is None:
+            raise click.UsageError('precompute 결과를 서버와 공유하려면 REDIS_URL(연결 가능한 Redis)을 설정하세요.')
 
-app = Flask(__name__)
-app.config.from_object(Config)
+        service = app.extensions.get('stock_service') or StockRecommendationService()
+        count = asyncio.run(service.precompute(keywords))
+        click.echo(f"✅ precompute 완료: {count}개 키워드 캐시 적재")
 
-app.register_blueprint(stock_bp, url_prefix='/api')
+    return app
 
-@app.route('/health')
-def health_check():
-    """헬스 체크 엔드포인트"""
-    return jsonify({'status': 'healthy', 'service': 'KosWave Stock API'}), 200
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
@@ -4,7 +4,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class Config:
-    # Flask 설정
+    # Quart(Flask 호환) 설정
     # SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
     DEBUG = os.getenv('FLASK_DEBUG', 'False') == 'True'
 
@@ -13,6 +13,9 @@ class Config:
     
     # Embedding 모델 설정
     EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small')
+    # text-embedding-3 계열은 차원 축소 지원 (512D: HNSW 메모리/거리 계산 약 1/3, 0이면 모델 기본 차원)
+    EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', '512'))
+    EMBEDDING_TPM = int(os.getenv('EMBEDDING_TPM', '1000000'))  # 임베딩 API 분당 토큰 한도 (적재 시 rate limit)
     
     # LLM 모델 설정 (temperature 0으로 고정하여 추천 결과 흔들림 방지)
     # LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-4o-mini')
@@ -22,26 +25,72 @@ class Config:
 
     # ChromaDB 설정
     CHROMA_DB_PATH = os.getenv('CHROMA_DB_PATH', './data/chroma_db')
-    CHROMA_COLLECTION_NAME = os.getenv('CHROMA_COLLECTION_NAME', 'stocks')
-    CHROMA_NEWS_COLLECTION_NAME = os.getenv('CHROMA_NEWS_COLLECTION_NAME', 'news')
+    # 임베딩 차원이 바뀌면 재적재가 필요하므로 컬렉션 이름에 버전/차원을 포함
+    EMBEDDING_INDEX_VERSION = f"v2_{EMBEDDING_DIMENSIONS}d" if EMBEDDING_DIMENSIONS else "v1"
+    CHROMA_COLLECTION_NAME = os.getenv('CHROMA_COLLECTION_NAME', f'stocks_{EMBEDDING_INDEX_VERSION}')
+    CHROMA_NEWS_COLLECTION_NAME = os.getenv('CHROMA_NEWS_COLLECTION_NAME', f'news_{EMBEDDING_INDEX_VERSION}')
 
     
     # 주식 데이터 파일 경로
     STOCK_DATA_PATH = os.getenv('STOCK_DATA_PATH', './data/stock_info.json')
     NEWS_DATA_PATH = os.getenv('NEWS_DATA_PATH', './data/news.json')
+    SYNONYMS_PATH = os.getenv('SYNONYMS_PATH', './data/synonyms_ko.json')
 
     # 검색 설정
+    SHORT_CONTENT_LENGTH = int(os.getenv('SHORT_CONTENT_LENGTH', '400'))  # 적재 시 metadata["short"] 길이
     MAX_SEARCH_RESULTS = int(os.getenv('MAX_SEARCH_RESULTS', 10))
 
-    # Retrieval 설정 (Recall을 크게 해서 후보군 누락 방지)
-    RECALL_K = int(os.getenv('RECALL_K', '15'))
-    RERANK_TOP_K = int(os.getenv('RERANK_TOP_K', '12'))
+    # Retrieval 설정 (Recall은 HNSW ef로 확보하고, LLM 입력 후보 수는 작게 유지)
+    RECALL_K = int(os.getenv('RECALL_K', '40'))
+    RERANK_TOP_K = int(os.getenv('RERANK_TOP_K', '15'))
+    RERANK_INPUT_MAX = int(os.getenv('RERANK_INPUT_MAX', '40'))  # 후보 포맷팅 상한 (프롬프트 토큰 제한)
+
+    # HNSW 인덱스 설정 (M/construction_ef는 인덱스 구축 시 고정, 변경 시 기존 컬렉션 재구축)
+    HNSW_M = int(os.getenv('HNSW_M', '24'))
+    HNSW_CONSTRUCTION_EF = int(os.getenv('HNSW_CONSTRUCTION_EF', '200'))
+    HNSW_SEARCH_EF = int(os.getenv('HNSW_SEARCH_EF', '128'))
+    HNSW_BATCH_SIZE = int(os.getenv('HNSW_BATCH_SIZE', '1000'))
+    HNSW_SYNC_THRESHOLD = int(os.getenv('HNSW_SYNC_THRESHOLD', '10000'))
+
+    # 주식 Recall을 in-process FAISS HNSW 미러로 수행 (faiss 미설치 시 Chroma 사용)
+    FAISS_MIRROR = os.getenv('FAISS_MIRROR', 'True') == 'True'
+    FAISS_HNSW_M = int(os.getenv('FAISS_HNSW_M', '32'))
 
     # 속도 최적화 모드
     FAST_MODE = os.getenv('FAST_MODE', 'True') == 'True'
     FAST_RECALL_K = int(os.getenv('FAST_RECALL_K', '8'))
     FAST_NEWS_K = int(os.getenv('FAST_NEWS_K', '0'))
 
+    # 로컬 bi-encoder 쿼리 확장 (LLM 확장 대체, CPU ONNX 추론)
+    # 사용 전 onnxruntime/tokenizers 설치 및 모델 export 필요 (utils/local_expander.py의 EXPORT_COMMAND 참고)
+    USE_LOCAL_EXPANDER = os.getenv('USE_LOCAL_EXPANDER', 'False') == 'True'
+    LOCAL_EXPANDER_MODEL_PATH = os.getenv('LOCAL_EXPANDER_MODEL_PATH', './data/ko-sbert/model.onnx')
+    LOCAL_EXPANDER_TOKENIZER_PATH = os.getenv('LOCAL_EXPANDER_TOKENIZER_PATH', './data/ko-sbert/tokenizer.json')
+    LOCAL_EXPANDER_TOP_K = int(os.getenv('LOCAL_EXPANDER_TOP_K', '10'))
+
+    # 품질 우선 모드 (A/B용: One-Shot 대신 Rerank → Final 2단계 LLM 호출)
+    QUALITY_MODE = os.getenv('QUALITY_MODE', 'False') == 'True'
+
+    # LLM 배칭 설정 (동시 요청 마이크로 배칭 + precompute용 Batch API)
+    # 배치 응답(최대 BATCH_MAX×6개 항목)이 끝나야 응답하므로 지연 측정 전까지 기본 비활성
+    LLM_MICRO_BATCH = os.getenv('LLM_MICRO_BATCH', 'False') == 'True'
+    BATCH_MAX = int(os.getenv('BATCH_MAX', '16'))
+    BATCH_WINDOW_MS = int(os.getenv('BATCH_WINDOW_MS', '30'))
+    BATCH_POLL_INTERVAL = int(os.getenv('BATCH_POLL_INTERVAL', '30'))
+    # precompute 시 동시에 수행할 키워드별 쿼리 확장/Retrieval(QUALITY_MODE는 Rerank LLM 포함) 수
+    PRECOMPUTE_CONCURRENCY = int(os.getenv('PRECOMPUTE_CONCURRENCY', '8'))
+
+    # 추천 결과 캐시 설정 (REDIS_URL 미설정/연결 실패 시 in-proc LRU 사용)
+    REDIS_URL = os.getenv('REDIS_URL', '')
+    RECOMMENDATION_CACHE_TTL = int(os.getenv('RECOMMENDATION_CACHE_TTL', str(6 * 60 * 60)))
+    EMBEDDING_CACHE_TTL = int(os.getenv('EMBEDDING_CACHE_TTL', str(7 * 24 * 60 * 60)))
+    EMBEDDING_CACHE_DTYPE = os.getenv('EMBEDDING_CACHE_DTYPE', 'float16')
+    LOCAL_CACHE_MAXSIZE = int(os.getenv('LOCAL_CACHE_MAXSIZE', '1024'))
+    QUERY_EXPAND_CACHE_DIR = os.getenv('QUERY_EXPAND_CACHE_DIR', os.path.join(CHROMA_DB_PATH, 'query_expand_cache'))
+    QUERY_EXPAND_CACHE_TTL = int(os.getenv('QUERY_EXPAND_CACHE_TTL', str(3 * 24 * 60 * 60)))  # LLM 확장 디스크 캐시
+    SEMANTIC_CACHE_ENABLED = os.getenv('SEMANTIC_CACHE_ENABLED', 'False') == 'True'
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.95'))
+
     @staticmethod
     def validate():
         """필수 설정 검증"""
@@ -1,4 +1,22 @@
 """Models package for data schemas"""
-from .schemas import RerankItem, RerankResult, StockRecommendation
+from .schemas import (
+    RerankItem,
+    RerankResult,
+    NewsItem,
+    RecommendationItem,
+    FinalRecommendations,
+    KeywordRecommendations,
+    BatchRecommendations,
+    StockRecommendation,
+)
 
-__all__ = ['RerankItem', 'RerankResult', 'StockRecommendation']
+__all__ = [
+    'RerankItem',
+    'RerankResult',
+    'NewsItem',
+    'RecommendationItem',
+    'FinalRecommendations',
+    'KeywordRecommendations',
+    'BatchRecommendations',
+    'StockRecommendation',
+]
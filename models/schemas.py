@@ -24,10 +24,30 @@ class NewsItem(BaseModel):
     published_date: str = Field(..., description="발행 날짜")
 
 
-class StockRecommendation(BaseModel):
-    """Final stock recommendation - API response format"""
+class RecommendationItem(BaseModel):
+    """Stock recommendation generated by LLM (without news)"""
     name: str = Field(..., description="종목명")
     code: str = Field(..., description="종목 코드")
     description: str = Field(..., description="유사한 이유 설명 (AI가 작성함)")
     similarity: float = Field(..., ge=0.0, le=1.0, description="유사도 점수 (0.0~1.0)")
+
+
+class FinalRecommendations(BaseModel):
+    """List of final recommendation items (LLM structured output)"""
+    items: List[RecommendationItem]
+
+
+class KeywordRecommendations(BaseModel):
+    """Recommendation items for a single keyword in a batched LLM call"""
+    keyword: str = Field(..., description="요청 키워드")
+    items: List[RecommendationItem]
+
+
+class BatchRecommendations(BaseModel):
+    """Batched LLM structured output (one entry per keyword)"""
+    results: List[KeywordRecommendations]
+
+
+class StockRecommendation(RecommendationItem):
+    """Final stock recommendation - API response format"""
     news: List[NewsItem] = Field(default_factory=list, description="관련 뉴스 리스트")
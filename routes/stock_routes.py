@@ -1,20 +1,36 @@
-from flask import Blueprint, request, jsonify
-from services.stock_recommendation_service import StockRecommendationService
-import traceback
+import logging
+import orjson
+from quart import Blueprint, Response, current_app, request, jsonify
+
+logger = logging.getLogger(__name__)
 
 stock_bp = Blueprint('stock', __name__)
-stock_service = StockRecommendationService()
+
+
+async def _iter_ndjson(agen):
+    """추천 async generator를 NDJSON 라인 스트림으로 변환 (ASGI 이벤트 루프에서 직접 실행)"""
+    try:
+        async for rec in agen:
+            yield orjson.dumps(rec) + b"\n"
+    except Exception as e:
+        logger.exception("❌ Error in search_stocks stream: %s", e)
+        yield orjson.dumps({'error': 'Internal server error', 'detail': str(e)}) + b"\n"
+    finally:
+        await agen.aclose()
+
 
 @stock_bp.route('/company', methods=['GET'])
-def search_stocks():
+async def search_stocks():
     """
     키워드로 유사한 주식 검색
     
     Query Parameters:
         keyword (str): 검색 키워드
+        stream (str, optional): "true"이면 추천 종목이 완성될 때마다 NDJSON으로 스트리밍
         
     Returns:
         JSON 배열: [{"name": str, "code": str, "description": str, "similarity": float}]
+        (stream=true: application/x-ndjson, 한 줄에 추천 종목 1개)
     """
     try:
         keyword = request.args.get('keyword')
@@ -22,8 +38,16 @@ def search_stocks():
         if not keyword:
             return jsonify({'error': 'keyword is required'}), 400
         
-        # 추천 결과 가져오기 (배열 형태)
-        recommendations = stock_service.get_recommendations(keyword)
+        # 추천 결과 가져오기 (배열 형태, 서비스는 create_app에서 1회 초기화)
+        stock_service = current_app.extensions['stock_service']
+        
+        if request.args.get('stream', 'false').lower() == 'true':
+            return Response(
+                _iter_ndjson(stock_service.stream_recommendations(keyword)),
+                mimetype='application/x-ndjson'
+            )
+        
+        recommendations = await stock_service.get_recommendations(keyword)
         
         # 배열 그대로 반환
         return jsonify(recommendations), 200
@@ -35,8 +59,7 @@ def search_stocks():
         }), 500
         
     except Exception as e:
-        print(f"❌ Error in search_stocks: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("❌ Error in search_stocks: %s", e)
         return jsonify({
             'error': 'Internal server error',
             'detail': str(e)
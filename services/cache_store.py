@@ -0,0 +1,98 @@
+"""Shared cache backend (Redis 우선, in-proc LRU fallback)"""
+import functools
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Optional
+from config import Config
+
+try:
+    import redis
+except ImportError:  # redis 미설치 환경에서는 in-proc 캐시만 사용
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def get_redis_client():
+    """공유 Redis 클라이언트 (미설정/연결 실패 시 None → in-proc 캐시 사용)"""
+    if redis is None or not Config.REDIS_URL:
+        logger.info("ℹ️ Redis 미설정, in-proc LRU 캐시 사용")
+        return None
+    try:
+        client = redis.Redis.from_url(
+            Config.REDIS_URL,
+            socket_connect_timeout=0.5,
+            socket_timeout=0.5
+        )
+        client.ping()
+        logger.info("✅ Redis 캐시 연결 완료")
+        return client
+    except Exception as e:
+        logger.warning("⚠️ Redis 연결 실패, in-proc LRU 캐시 사용: %s", e)
+        return None
+
+
+class LocalLRUCache:
+    """프로세스 내부 LRU 캐시 (TTL 포함, thread-safe)"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def setex(self, key: str, ttl: int, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class CacheStore:
+    """
+    bytes 값 캐시 (Redis 우선, 미설정/오류 시 in-proc LRU로 fallback)
+
+    추천 결과 캐시와 쿼리 임베딩 캐시가 같은 get/set 경로를 공유
+    """
+
+    def __init__(self, ttl: int, maxsize: int = Config.LOCAL_CACHE_MAXSIZE):
+        """
+        Args:
+            ttl: 만료 시간 (초)
+            maxsize: in-proc LRU 최대 항목 수
+        """
+        self.ttl = ttl
+        self.local = LocalLRUCache(maxsize)
+        self.redis = get_redis_client()
+
+    def get(self, key: str) -> Optional[bytes]:
+        if self.redis is not None:
+            try:
+                return self.redis.get(key)
+            except redis.RedisError as e:
+                logger.warning("⚠️ Redis GET 실패, in-proc 캐시 조회: %s", e)
+        return self.local.get(key)
+
+    def set(self, key: str, raw: bytes):
+        if self.redis is not None:
+            try:
+                self.redis.setex(key, self.ttl, raw)
+                return
+            except redis.RedisError as e:
+                logger.warning("⚠️ Redis SETEX 실패, in-proc 캐시 저장: %s", e)
+        self.local.setex(key, self.ttl, raw)
@@ -0,0 +1,49 @@
+"""Embeddings cache façade (Redis 우선, in-proc LRU fallback)"""
+import hashlib
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from services.cache_store import CacheStore
+from config import Config
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    쿼리 임베딩 캐시 (EmbeddingsCache 패턴)
+
+    - key: emb:{dtype}:{sha1(model:text)}
+    - value: EMBEDDING_CACHE_DTYPE bytes (float16 기본: JSON 리스트 대비 1/4 크기)
+    - embed_documents는 적재용이므로 캐시 없이 그대로 위임
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str):
+        """
+        Args:
+            embeddings: 실제 임베딩 모델 (OpenAIEmbeddings)
+            model: 캐시 키에 포함할 모델명 (모델 변경 시 캐시 분리)
+        """
+        self.embeddings = embeddings
+        self.model = model
+        self.dtype = np.dtype(Config.EMBEDDING_CACHE_DTYPE)
+        self.store = CacheStore(Config.EMBEDDING_CACHE_TTL)
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha1(f"{self.model}:{text}".encode("utf-8")).hexdigest()
+        return f"emb:{self.dtype.name}:{digest}"
+
+    def embed_query(self, text: str) -> List[float]:
+        """쿼리 임베딩 (캐시 미스 시에만 API 호출)"""
+        key = self._key(text)
+        raw = self.store.get(key)
+        if raw is not None:
+            # 저장 dtype과 무관하게 float32로 복원하여 반환 (cosine 검색 정확도 영향 미미)
+            return np.frombuffer(raw, dtype=self.dtype).astype(np.float32).tolist()
+
+        # 미스 시에도 저장 dtype을 거친 값을 반환 (적중/미스, worker와 무관하게 같은 쿼리는 같은 벡터)
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=self.dtype)
+        self.store.set(key, vector.tobytes())
+        return vector.astype(np.float32).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """문서 임베딩 (캐시 없이 위임)"""
+        return self.embeddings.embed_documents(texts)
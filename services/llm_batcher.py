@@ -0,0 +1,226 @@
+"""LLM request batching: interactive micro-batching + OpenAI Batch API for precompute"""
+import asyncio
+import io
+import json
+import logging
+import time
+from typing import Dict, List, Tuple
+import orjson
+from langchain_core.prompts import ChatPromptTemplate
+from openai import OpenAI
+from models.schemas import BatchRecommendations, FinalRecommendations
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Batch API 요청도 단건 체인(with_structured_output)과 같은 FinalRecommendations 스키마로 출력 형식 지정
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": FinalRecommendations.__name__,
+        "schema": FinalRecommendations.model_json_schema()
+    }
+}
+
+
+class LLMBatcher:
+    """
+    동시에 들어온 키워드 추천 요청을 하나의 LLM 호출로 묶는 배처
+
+    - submit(): BATCH_WINDOW_MS 동안 최대 BATCH_MAX개 요청을 모아 한 번에 호출
+      (요청이 1개뿐이면 기존 단건 final_chain 그대로 사용)
+    - run_batch_job(): 비대화형 precompute 용 OpenAI Batch API 제출/폴링
+
+    배처는 submit을 호출한 이벤트 루프(ASGI worker 루프)에서 큐와 수집 태스크를 관리함
+    (LLM 클라이언트의 비동기 HTTP 커넥션 풀을 서버 루프와 공유하기 위함).
+    """
+
+    def __init__(self, llm, final_prompt: ChatPromptTemplate, final_chain):
+        """
+        Args:
+            llm: ChatOpenAI 인스턴스
+            final_prompt: 단건 추천 프롬프트 (Batch API 요청 생성에 재사용)
+            final_chain: 단건 추천 체인 (배치 크기 1 또는 배치 응답 누락 시 사용)
+        """
+        self.llm = llm
+        self.final_prompt = final_prompt
+        self.final_chain = final_chain
+        self.max_size = Config.BATCH_MAX
+        self.window = Config.BATCH_WINDOW_MS / 1000
+
+        self.batch_prompt = ChatPromptTemplate.from_template("""
+아래 JSON 배열의 각 요청(keyword, candidates)마다 독립적으로 추천을 생성하세요.
+
+요청 목록:
+{requests}
+
+지시사항:
+1. 각 요청마다 candidates 중 keyword와 가장 연관성 높은 6개 종목을 선정하세요.
+2. 각 종목 선정 이유(description)를 1문장으로 핵심만 간단하게 요약하세요.
+3. 연관성 점수(similarity)는 0.0~1.0입니다.
+4. 결과의 keyword는 요청의 keyword를 그대로 사용하세요.
+""")
+        self.batch_chain = self.batch_prompt | self.llm.with_structured_output(BatchRecommendations)
+
+        # 배처 큐/수집 태스크는 submit을 호출한 이벤트 루프에서 지연 생성
+        # (ChatOpenAI의 캐시된 httpx.AsyncClient가 해당 루프에 묶이므로 서버 루프와 같은 루프에서 호출해야 함)
+        self._loop = None
+        self._queue = None
+        self._collector = None
+        self._tasks = set()
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # 새 루프(worker 시작, precompute용 asyncio.run 등)에서는 큐와 수집 태스크를 다시 생성
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._collector = loop.create_task(self._collect())
+
+    async def submit(self, keyword: str, candidates: str) -> List[Dict]:
+        """
+        추천 요청을 배처에 제출 (현재 실행 중인 이벤트 루프에서 수집/호출)
+
+        Args:
+            keyword: 검색 키워드
+            candidates: 포맷된 후보 종목 텍스트
+
+        Returns:
+            추천 항목 리스트 (RecommendationItem dict)
+        """
+        self._ensure_started()
+        result = self._loop.create_future()
+        await self._queue.put((keyword, candidates, result))
+        return await result
+
+    async def _collect(self):
+        """큐에서 요청을 모아 BATCH_WINDOW_MS 또는 BATCH_MAX 도달 시 처리"""
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.window
+            while len(batch) < self.max_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # 실행 중인 dispatch 태스크가 GC되지 않도록 참조 유지
+            task = self._loop.create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, str, asyncio.Future]]):
+        # 연결이 끊겨 취소된 요청은 LLM 호출에서 제외
+        batch = [request for request in batch if not request[2].done()]
+        results = {}
+        if len(batch) > 1:
+            logger.debug("📦 LLM 마이크로 배치 호출: %d개 키워드", len(batch))
+            try:
+                results = await self._invoke_batch(batch)
+            except Exception as e:
+                # 한 키워드의 응답 검증 실패 등으로 배치 전체가 실패하면 요청별 단건 호출로 대체
+                logger.warning("⚠️ LLM 배치 호출 실패, 단건 호출로 대체: %s", e)
+
+        # 배치 응답에서 누락된 키워드(또는 배치 크기 1)는 단건 호출로 보완
+        await asyncio.gather(*(
+            self._resolve(keyword, candidates, future, results.get(keyword))
+            for keyword, candidates, future in batch
+        ))
+
+    async def _resolve(self, keyword: str, candidates: str, future: asyncio.Future, items):
+        """요청별 결과 전달 (실패는 해당 요청에만 전달, 이미 취소된 요청은 건너뜀)"""
+        try:
+            if items is None:
+                items = await self._invoke_single(keyword, candidates)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            # 같은 키워드가 한 배치에 여러 번 들어와도 결과 dict를 공유하지 않도록 복사
+            future.set_result([dict(item) for item in items])
+
+    async def _invoke_single(self, keyword: str, candidates: str) -> List[Dict]:
+        result = await self.final_chain.ainvoke({
+            "keyword": keyword,
+            "candidates": candidates
+        })
+        return [item.model_dump() for item in result.items]
+
+    async def _invoke_batch(self, batch) -> Dict[str, List[Dict]]:
+        requests = orjson.dumps(
+            [{"keyword": keyword, "candidates": candidates} for keyword, candidates, _ in batch]
+        ).decode()
+        result = await self.batch_chain.ainvoke({"requests": requests})
+        return {
+            rec.keyword: [item.model_dump() for item in rec.items]
+            for rec in result.results
+        }
+
+    def run_batch_job(self, requests: List[Tuple[str, str]]) -> Dict[str, List[Dict]]:
+        """
+        OpenAI Batch API로 추천을 일괄 생성 (precompute/웜업 용, 비대화형)
+
+        Args:
+            requests: (keyword, candidates) 튜플 리스트
+
+        Returns:
+            keyword → 추천 항목 리스트 딕셔너리 (실패한 키워드는 제외)
+        """
+        client = OpenAI(api_key=Config.OPENAI_API_KEY)
+        model = Config.FAST_LLM_MODEL if Config.FAST_MODE else Config.LLM_MODEL
+
+        # 요청별 JSONL 라인 생성 (custom_id = 요청 인덱스)
+        lines = []
+        for idx, (keyword, candidates) in enumerate(requests):
+            # format()은 "Human: " 역할 접두어가 붙은 문자열을 반환하므로 메시지 본문만 사용
+            prompt = self.final_prompt.format_messages(keyword=keyword, candidates=candidates)[0].content
+            lines.append(json.dumps({
+                "custom_id": str(idx),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": model,
+                    "messages": [
+                        {"role": "user", "content": prompt}
+                    ],
+                    "response_format": BATCH_RESPONSE_FORMAT
+                }
+            }, ensure_ascii=False))
+
+        batch_file = client.files.create(
+            file=("precompute.jsonl", io.BytesIO("\n".join(lines).encode("utf-8"))),
+            purpose="batch"
+        )
+        job = client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info("📦 Batch API 작업 제출: %s (%d개 요청)", job.id, len(lines))
+
+        while job.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(Config.BATCH_POLL_INTERVAL)
+            job = client.batches.retrieve(job.id)
+
+        if job.status != "completed" or not job.output_file_id:
+            logger.error("❌ Batch API 작업 실패: %s (%s)", job.id, job.status)
+            return {}
+
+        results = {}
+        output = client.files.content(job.output_file_id).text
+        for line in output.splitlines():
+            row = json.loads(line)
+            keyword = requests[int(row["custom_id"])][0]
+            try:
+                content = row["response"]["body"]["choices"][0]["message"]["content"]
+                parsed = FinalRecommendations.model_validate_json(content)
+                results[keyword] = [item.model_dump() for item in parsed.items]
+            except Exception as e:
+                logger.warning("⚠️ Batch 응답 파싱 실패, 건너뜀: %s (%s)", keyword, e)
+
+        logger.info("✅ Batch API 작업 완료: %d/%d개 성공", len(results), len(requests))
+        return results
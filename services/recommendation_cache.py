@@ -0,0 +1,186 @@
+"""Recommendation cache service (Redis 우선, in-proc LRU fallback)"""
+import asyncio
+import hashlib
+import logging
+from array import array
+from threading import Lock
+from typing import Any, Callable, List, Optional
+import orjson
+from services.cache_store import CacheStore, LocalLRUCache, redis
+from utils.keyword_synonyms import normalize_keyword
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 임베딩 차원/컬렉션 버전이 바뀌면 추천 결과와 semantic 인덱스(DIM 고정)를 분리
+CACHE_VERSION = f"v1_{Config.EMBEDDING_INDEX_VERSION}"
+
+
+class RecommendationCache:
+    """
+    키워드 기반 추천 결과 캐시
+
+    - exact 캐시: {namespace}:{CACHE_VERSION}:{sha1(정규화 키워드)} → JSON (orjson UTF-8 bytes)
+    - semantic 캐시 (선택): 키워드 임베딩 KNN으로 유사 키워드의 결과 재사용
+      (RedisSemanticCache 패턴, Redis Search 모듈이 있을 때만 동작)
+    """
+
+    SEMANTIC_INDEX = f"rec_semantic_{CACHE_VERSION}"
+    SEMANTIC_PREFIX = f"recsem:{CACHE_VERSION}:"
+
+    def __init__(self, embed_fn: Optional[Callable[[str], List[float]]] = None):
+        """
+        Args:
+            embed_fn: semantic 캐시에 사용할 임베딩 함수 (없으면 semantic 비활성)
+        """
+        self.ttl = Config.RECOMMENDATION_CACHE_TTL
+        self.store = CacheStore(self.ttl)
+        self.redis = self.store.redis
+
+        self.embed_fn = embed_fn
+        self._embedding_memo = LocalLRUCache(256)
+        self.semantic_enabled = bool(
+            Config.SEMANTIC_CACHE_ENABLED and embed_fn and self.redis is not None
+        )
+        self._semantic_index_ready = False
+        self._semantic_index_lock = Lock()
+
+    @staticmethod
+    def make_key(keyword: str, namespace: str = "rec") -> str:
+        digest = hashlib.sha1(normalize_keyword(keyword).encode("utf-8")).hexdigest()
+        return f"{namespace}:{CACHE_VERSION}:{digest}"
+
+    def get(self, keyword: str, namespace: str = "rec") -> Optional[Any]:
+        """
+        캐시 조회
+
+        Args:
+            keyword: 검색 키워드
+            namespace: 캐시 구분 (rec: 최종 결과, expand: 확장 쿼리, rerank: Quality 모드 Rerank 결과)
+
+        Returns:
+            캐시된 값 또는 None
+        """
+        key = self.make_key(keyword, namespace)
+        raw = self.store.get(key)
+        if raw is None and namespace == "rec" and self.semantic_enabled:
+            raw = self._semantic_get(keyword)
+        if raw is None:
+            return None
+        return orjson.loads(raw)
+
+    def set(self, keyword: str, value: Any, namespace: str = "rec"):
+        """캐시 저장 (TTL 적용)"""
+        key = self.make_key(keyword, namespace)
+        raw = orjson.dumps(value)
+        self.store.set(key, raw)
+        if namespace == "rec" and self.semantic_enabled:
+            self._semantic_set(keyword, key)
+
+    # 비동기 버전: Redis I/O와 semantic 캐시 임베딩 호출이 이벤트 루프를 막지 않도록 스레드에서 실행
+    async def aget(self, keyword: str, namespace: str = "rec") -> Optional[Any]:
+        """get의 비동기 버전"""
+        return await asyncio.to_thread(self.get, keyword, namespace)
+
+    async def aset(self, keyword: str, value: Any, namespace: str = "rec"):
+        """set의 비동기 버전"""
+        await asyncio.to_thread(self.set, keyword, value, namespace)
+
+    def _embed(self, keyword: str) -> bytes:
+        """키워드 임베딩 (float32 bytes, get/set 간 재사용)"""
+        normalized = normalize_keyword(keyword)
+        vector = self._embedding_memo.get(normalized)
+        if vector is None:
+            vector = array("f", self.embed_fn(normalized)).tobytes()
+            self._embedding_memo.setex(normalized, self.ttl, vector)
+        return vector
+
+    def _ensure_semantic_index(self, dim: int) -> bool:
+        """
+        semantic 캐시용 Redis 벡터 인덱스 생성 (Search 모듈 없으면 비활성)
+
+        캐시 조회/저장은 스레드에서 동시에 실행되므로 lock으로 확인/생성을 직렬화하고,
+        다른 프로세스(worker)가 먼저 만든 경우("Index already exists")도 준비 완료로 처리
+        """
+        if self._semantic_index_ready:
+            return True
+        with self._semantic_index_lock:
+            if self._semantic_index_ready:
+                return True
+            try:
+                from redis.commands.search.field import TextField, VectorField
+                try:
+                    from redis.commands.search.index_definition import IndexDefinition, IndexType
+                except ImportError:
+                    from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+
+                search = self.redis.ft(self.SEMANTIC_INDEX)
+                try:
+                    search.info()
+                except redis.ResponseError:
+                    try:
+                        search.create_index(
+                            [
+                                TextField("target"),
+                                VectorField("vector", "HNSW", {
+                                    "TYPE": "FLOAT32",
+                                    "DIM": dim,
+                                    "DISTANCE_METRIC": "COSINE"
+                                })
+                            ],
+                            definition=IndexDefinition(
+                                prefix=[self.SEMANTIC_PREFIX],
+                                index_type=IndexType.HASH
+                            )
+                        )
+                    except redis.ResponseError as e:
+                        if "already exists" not in str(e).lower():
+                            raise
+                self._semantic_index_ready = True
+            except Exception as e:
+                logger.warning("⚠️ Semantic 캐시 비활성화 (Redis Search 사용 불가): %s", e)
+                self.semantic_enabled = False
+        return self._semantic_index_ready
+
+    def _semantic_get(self, keyword: str) -> Optional[bytes]:
+        """유사 키워드(cosine ≥ threshold)의 캐시 결과 조회"""
+        try:
+            from redis.commands.search.query import Query
+
+            vector = self._embed(keyword)
+            if not self._ensure_semantic_index(len(vector) // 4):
+                return None
+
+            query = (
+                Query("*=>[KNN 1 @vector $vec AS dist]")
+                .sort_by("dist")
+                .return_fields("target", "dist")
+                .dialect(2)
+            )
+            docs = self.redis.ft(self.SEMANTIC_INDEX).search(
+                query, query_params={"vec": vector}
+            ).docs
+            if not docs:
+                return None
+
+            # COSINE distance = 1 - cosine similarity
+            if 1.0 - float(docs[0].dist) < Config.SEMANTIC_CACHE_THRESHOLD:
+                return None
+            return self.store.get(docs[0].target)
+        except Exception as e:
+            logger.warning("⚠️ Semantic 캐시 조회 실패: %s", e)
+            return None
+
+    def _semantic_set(self, keyword: str, target_key: str):
+        """키워드 임베딩을 semantic 인덱스에 등록"""
+        try:
+            vector = self._embed(keyword)
+            if not self._ensure_semantic_index(len(vector) // 4):
+                return
+            semantic_key = self.SEMANTIC_PREFIX + target_key.rsplit(":", 1)[-1]
+            pipe = self.redis.pipeline()
+            pipe.hset(semantic_key, mapping={"target": target_key, "vector": vector})
+            pipe.expire(semantic_key, self.ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning("⚠️ Semantic 캐시 저장 실패: %s", e)
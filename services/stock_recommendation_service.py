@@ -1,22 +1,42 @@
 """Stock recommendation service with LLM-based reranking"""
-import json
-from typing import List, Dict
+import asyncio
+import logging
+from collections import defaultdict
+from typing import AsyncIterator, List, Dict, Tuple
+import numpy as np
+import orjson
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from models.schemas import StockRecommendation
+from models.schemas import FinalRecommendations, RecommendationItem, RerankResult
+from utils.keyword_synonyms import normalize_keyword
 from utils.query_expander import QueryExpander
 from services.vector_store_service import VectorStoreService
+from services.recommendation_cache import RecommendationCache
+from services.llm_batcher import LLMBatcher
 from config import Config
 
+logger = logging.getLogger(__name__)
+
 
 class StockRecommendationService:
-    """주식 추천 서비스: 쿼리 확장 → Retrieval → Rerank → Final"""
+    """주식 추천 서비스: 쿼리 확장 → Retrieval → Rerank → Final (Singleton)"""
+    
+    _instance = None
+    _initialized = False
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(StockRecommendationService, cls).__new__(cls)
+        return cls._instance
     
     def __init__(self):
-        """Initialize recommendation service"""
+        """Initialize recommendation service (only once)"""
+        if StockRecommendationService._initialized:
+            return
+        
         self.vector_store = VectorStoreService()
         self.query_expander = QueryExpander()
+        self.cache = RecommendationCache(embed_fn=self.vector_store.embed_query)
         
         # LLM 초기화
         self.llm = ChatOpenAI(
@@ -26,6 +46,7 @@ class StockRecommendationService:
         )
         
         # One-Shot Recommendation Chain (Selection + Explanation)
+        # Structured Output으로 디코딩 단계에서 스키마를 강제 (JSON 파싱 실패/재시도 제거)
         self.final_prompt = ChatPromptTemplate.from_template("""
 키워드: {keyword}
 
@@ -36,23 +57,35 @@ class StockRecommendationService:
 1. 위 후보 중 키워드와 가장 연관성 높은 6개 종목을 선정하세요.
 2. 각 종목 선정 이유(description)를 1문장으로 핵심만 간단하게 요약하세요.
 3. 연관성 점수(similarity)는 0.0~1.0입니다.
-4. 아래 JSON 포맷으로 출력하세요. (JSON만 출력)
+""")
+        self.final_chain = self.final_prompt | self.llm.with_structured_output(FinalRecommendations)
+        
+        # 스트리밍용 체인: dict 스키마로 지정하면 부분 JSON(dict)이 점진적으로 생성됨
+        self.final_stream_chain = self.final_prompt | self.llm.with_structured_output(
+            FinalRecommendations.model_json_schema()
+        )
+        
+        # Quality 모드 (A/B 비교용): Rerank → Final 2단계 체인
+        if Config.QUALITY_MODE:
+            self.rerank_prompt = ChatPromptTemplate.from_template("""
+키워드: {keyword}
+
+후보 종목:
+{candidates}
 
-[
-  {{
-    "name": "종목명",
-    "code": "종목코드",
-    "description": "핵심 선정 이유",
-    "similarity": 0.95
-  }}
-]
+지시사항:
+1. 각 후보가 키워드와 얼마나 관련 있는지 0~100 점수(score)로 평가하세요.
+2. 근거(evidence)는 후보 정보에서 찾은 키워드/구절 1~2개로 짧게 작성하세요.
+3. 관련성이 높은 순서로 정렬하세요.
 """)
+            self.rerank_chain = self.rerank_prompt | self.llm.with_structured_output(RerankResult)
+        
+        # 동시 요청 마이크로 배처 (Final 추천 LLM 호출을 묶어서 처리)
+        self.batcher = LLMBatcher(self.llm, self.final_prompt, self.final_chain)
         
-        # StrOutputParser 대신 JsonOutputParser 사용
-        self.final_parser = JsonOutputParser()
-        self.final_chain = self.final_prompt | self.llm | self.final_parser
+        StockRecommendationService._initialized = True
     
-    def get_recommendations(self, keyword: str):
+    async def get_recommendations(self, keyword: str):
         """
         키워드로 주식 추천 (뉴스 데이터 통합)
         
@@ -62,140 +95,311 @@ class StockRecommendationService:
         Returns:
             추천 종목 리스트 (배열 형태, 뉴스 포함)
         """
-        print(f"🔍 keyword = '{keyword}'")
+        logger.debug("🔍 keyword = '%s'", keyword)
         
-        # 1. Query Expansion
-        expanded_query = self.query_expander.expand(keyword)
-        print(f"🧠 expanded_query = {expanded_query}\n")
+        # 0. 캐시 조회 (적중 시 LLM/Vector 호출 없이 바로 반환)
+        cached_results = await self.cache.aget(keyword)
+        if cached_results is not None:
+            logger.debug("⚡ 캐시 적중: %d개 추천 결과 반환", len(cached_results))
+            return cached_results
         
-        # 2-1. 주식 정보 Retrieval (Recall)
-        docs_with_scores = self.vector_store.similarity_search_with_score(
-            expanded_query, 
-            k=Config.FAST_RECALL_K if Config.FAST_MODE else Config.RECALL_K
-        )
+        candidates_text, stock_news_map = await self._prepare_candidates(keyword)
         
-        # 2-2. 뉴스 데이터 Retrieval (키워드 기반)
-        news_docs_with_scores = []
-        if Config.FAST_MODE:
-            if Config.FAST_NEWS_K > 0:
-                news_docs_with_scores = self.vector_store.search_news_by_keyword(
-                    expanded_query,
-                    k=Config.FAST_NEWS_K
-                )
+        logger.debug("🤖 LLM 최종 추천 생성 중...")
+        if Config.LLM_MICRO_BATCH:
+            final_result = await self.batcher.submit(keyword, candidates_text)
         else:
-            news_docs_with_scores = self.vector_store.search_news_by_keyword(
-                expanded_query,
-                k=30  # 뉴스는 더 많이 검색하여 다양한 종목 커버
-            )
+            final_result = await self.final_chain.ainvoke({
+                "keyword": keyword,
+                "candidates": candidates_text
+            })
+            final_result = [item.model_dump() for item in final_result.items]
         
-        # 뉴스 from extraction (재활용을 위해 딕셔너리 저장)
-        stock_news_map = {}
-        for doc, _ in news_docs_with_scores:
-            code = doc.metadata.get('code')
-            news_item = {
-                "title": doc.metadata.get('title', ''),
-                "link": doc.metadata.get('link', ''),
-                "published_date": doc.metadata.get('published_date', '')
-            }
-            if code not in stock_news_map:
-                stock_news_map[code] = []
-            # 뉴스 최대 3개 저장 (최종 출력용)
-            if len(stock_news_map[code]) < 3:
-                stock_news_map[code].append(news_item)
-                
-        # 뉴스에서 추출한 종목 코드 집합
-        news_stock_codes = set(stock_news_map.keys())
-        
-        print(f"📰 뉴스에서 발견된 종목 수: {len(news_stock_codes)}")
-        
-        # 디버깅 로그
-        print("📋 Recall Top 10 (distance 낮을수록 유사):")
-        for i, (doc, distance) in enumerate(docs_with_scores[:10], 1):
-            m = doc.metadata
-            in_news = "📰" if m['code'] in news_stock_codes else "  "
-            print(f"  {i:02d}. dist={distance:.4f} | {m['name']}({m['code']}) | {m['industry']} {in_news}")
-        print()
+        return await self._attach_news(keyword, final_result, stock_news_map)
+    
+    async def stream_recommendations(self, keyword: str) -> AsyncIterator[Dict]:
+        """
+        키워드로 주식 추천 (스트리밍): LLM 출력에서 항목이 완성될 때마다 뉴스를 붙여 반환
+        
+        Args:
+            keyword: 검색 키워드
+            
+        Yields:
+            추천 종목 (뉴스 포함)
+        """
+        logger.debug("🔍 keyword = '%s' (stream)", keyword)
+        
+        cached_results = await self.cache.aget(keyword)
+        if cached_results is not None:
+            logger.debug("⚡ 캐시 적중: %d개 추천 결과 반환", len(cached_results))
+            for rec in cached_results:
+                yield rec
+            return
         
-        # 3. One-Shot Selection & Explanation
-        # Rerank 단계 없이 바로 후보군을 포맷팅하여 최종 추천 프롬프트에 넘김.
-        candidates_text = self._format_candidates_for_rerank(docs_with_scores, news_docs_with_scores)
+        candidates_text, stock_news_map = await self._prepare_candidates(keyword)
         
-        print("🤖 LLM 최종 추천 생성 중... (One-Shot)")
-        final_result = self.final_chain.invoke({
+        final_result = []
+        items = []
+        emitted = 0
+        async for partial in self.final_stream_chain.astream({
             "keyword": keyword,
             "candidates": candidates_text
-        })
+        }):
+            items = (partial or {}).get("items") or []
+            # 마지막 항목은 아직 생성 중일 수 있으므로 다음 항목이 시작된 것만 완성으로 간주
+            for item in items[emitted:len(items) - 1]:
+                rec = RecommendationItem.model_validate(item).model_dump()
+                final_result.append(rec)
+                yield self._with_news(rec, stock_news_map)
+            emitted = max(emitted, len(items) - 1)
         
-        # 5. 결과 검증 및 뉴스 추가 (DB 재조회 없이 매핑된 뉴스 사용)
-        print("📰 관련 뉴스 매핑 중... (DB 재조회 X)")
-        valid_results = []
-        for rec in final_result:
-            # 필수 필드 검증
-            if not all(key in rec for key in ['name', 'code', 'description', 'similarity']):
-                print(f"⚠️ 잘못된 응답 형식, 건너뜀: {rec}")
-                continue
+        for item in items[emitted:]:
+            rec = RecommendationItem.model_validate(item).model_dump()
+            final_result.append(rec)
+            yield self._with_news(rec, stock_news_map)
+        
+        # 빈 결과는 캐시하지 않음 (일시적 LLM 이상 응답이 TTL 동안 고정되지 않도록)
+        if final_result:
+            await self.cache.aset(keyword, final_result)
+    
+    async def precompute(self, keywords: List[str]) -> int:
+        """
+        인기 키워드 추천 결과를 Batch API로 미리 생성하여 캐시에 적재 (비대화형 웜업)
+        
+        Args:
+            keywords: 웜업할 키워드 리스트
             
-            stock_code = rec['code']
-            # 기존 뉴스 매핑 활용 (속도 최적화)
-            rec['news'] = stock_news_map.get(stock_code, [])
+        Returns:
+            캐시에 적재된 키워드 수
+        """
+        # 캐시 키와 같은 정규화 기준으로 중복 제거 (표기만 다른 키워드를 Batch API에 중복 요청하지 않음)
+        unique = {}
+        for keyword in keywords:
+            unique.setdefault(normalize_keyword(keyword), keyword)
+        keywords = list(unique.values())
+        cached_results = await asyncio.gather(*(self.cache.aget(keyword) for keyword in keywords))
+        pending = [keyword for keyword, cached in zip(keywords, cached_results) if cached is None]
+        if not pending:
+            return 0
+        
+        # 확장 캐시 미스 키워드는 LLM 확장을 한 번에 batch 호출하여 캐시에 적재
+        cached_expansions = await asyncio.gather(
+            *(self.cache.aget(keyword, namespace="expand") for keyword in pending)
+        )
+        unexpanded = [keyword for keyword, cached in zip(pending, cached_expansions) if cached is None]
+        if unexpanded:
+            expanded_queries = await asyncio.to_thread(self.query_expander.expand_many, unexpanded)
+            for keyword, expanded_query in zip(unexpanded, expanded_queries):
+                # 확장 실패로 원본 키워드가 돌아온 경우는 캐시하지 않음 (Retrieval 단계에서 다시 확장)
+                if expanded_query != keyword:
+                    await self.cache.aset(keyword, expanded_query, namespace="expand")
+        
+        # 캐시 미스 키워드의 쿼리 확장/Retrieval을 동시 수행하되 동시 LLM/임베딩 호출 수는 제한
+        semaphore = asyncio.Semaphore(Config.PRECOMPUTE_CONCURRENCY)
+        
+        async def prepare(keyword: str):
+            async with semaphore:
+                return await self._prepare_candidates(keyword)
+        
+        results = await asyncio.gather(*(prepare(keyword) for keyword in pending), return_exceptions=True)
+        prepared = {}
+        for keyword, result in zip(pending, results):
+            # 일부 키워드 실패(429 등)는 건너뛰고 나머지만 Batch API로 제출
+            if isinstance(result, Exception):
+                logger.warning("⚠️ precompute 후보 준비 실패, 건너뜀: %s (%s)", keyword, result)
+                continue
+            prepared[keyword] = result
+        if not prepared:
+            return 0
+        
+        batch_results = await asyncio.to_thread(
+            self.batcher.run_batch_job,
+            [(keyword, candidates_text) for keyword, (candidates_text, _) in prepared.items()]
+        )
+        cached = 0
+        for keyword, final_result in batch_results.items():
+            if not final_result:
+                continue
+            await self._attach_news(keyword, final_result, prepared[keyword][1])
+            cached += 1
+        return cached
+    
+    async def _prepare_candidates(self, keyword: str) -> Tuple[str, Dict[str, List[Dict]]]:
+        """
+        쿼리 확장 → Retrieval → 후보 포맷팅 (Rerank 모드 포함)
+        
+        Args:
+            keyword: 검색 키워드
             
-            # Fallback: 매핑된 뉴스가 없으면 DB 조회 (정확도 보장)
-            if not rec['news']:
-                # print(f"⚠️ 뉴스 보완 검색: {stock_code}")
-                rec['news'] = self.vector_store.search_news_by_stock_code(stock_code, k=3)
+        Returns:
+            (Final 프롬프트용 후보 텍스트, 종목 코드별 뉴스 맵)
+        """
+        # 1. Query Expansion
+        expanded_query = await self.cache.aget(keyword, namespace="expand")
+        if expanded_query is None:
+            # LLM 확장(fallback)은 동기 호출이므로 이벤트 루프를 막지 않도록 스레드에서 실행
+            expanded_query = await asyncio.to_thread(self.query_expander.expand, keyword)
+            await self.cache.aset(keyword, expanded_query, namespace="expand")
+        logger.debug("🧠 expanded_query = %s", expanded_query)
+        
+        # 2. 주식 정보 Recall + 뉴스 Retrieval (키워드 기반) 병렬 수행
+        recall_k = Config.FAST_RECALL_K if Config.FAST_MODE else Config.RECALL_K
+        news_k = Config.FAST_NEWS_K if Config.FAST_MODE else 30  # 뉴스는 더 많이 검색하여 다양한 종목 커버
+        
+        # 쿼리 임베딩은 1회만 계산하여 주식/뉴스 컬렉션 조회에 재사용
+        query_embedding = await self.vector_store.aembed_query(expanded_query)
+        stock_search = self.vector_store.asimilarity_search_by_vector_with_score(query_embedding, k=recall_k)
+        if news_k > 0:
+            stock_recall, news_docs_with_scores = await asyncio.gather(
+                stock_search,
+                self.vector_store.asearch_news_by_vector(query_embedding, k=news_k)
+            )
+        else:
+            stock_recall = await stock_search
+            news_docs_with_scores = []
+        
+        # 뉴스 from extraction (재활용을 위해 딕셔너리 저장, 1회 순회 후 최대 3개로 cap)
+        collected_news = defaultdict(list)
+        for doc, _ in news_docs_with_scores:
+            m = doc.metadata
+            collected_news[m.get('code')].append({
+                "title": m.get('title', ''),
+                "link": m.get('link', ''),
+                "published_date": m.get('published_date', '')
+            })
+        stock_news_map = {code: news[:3] for code, news in collected_news.items()}
+        
+        # 디버깅 로그 (DEBUG 레벨에서만 포맷팅)
+        if logger.isEnabledFor(logging.DEBUG):
+            news_codes = np.fromiter(stock_news_map.keys(), dtype=object, count=len(stock_news_map))
+            top10 = stock_recall.take(range(min(10, len(stock_recall))))
+            in_news_mask = np.isin(top10.codes, news_codes)
+            logger.debug("📰 뉴스에서 발견된 종목 수: %d", len(news_codes))
+            logger.debug("📋 Recall Top 10 (distance 낮을수록 유사):")
+            for i, ((code, name, industry, _, distance), in_news) in enumerate(zip(top10.candidates(), in_news_mask), 1):
+                logger.debug("  %02d. dist=%.4f | %s(%s) | %s %s", i, distance, name, code, industry, "📰" if in_news else "  ")
+        
+        if Config.QUALITY_MODE:
+            # 3-A. Rerank → Final 2단계 (LLM 2회 호출, A/B 비교용)
+            candidates_text = await self._rerank(keyword, stock_recall, news_docs_with_scores)
+        else:
+            # 3. One-Shot Selection & Explanation
+            # Rerank 단계 없이 distance 상위 RERANK_TOP_K개만 포맷팅하여 최종 추천 프롬프트에 넘김.
+            candidates_text = self._format_candidates_for_rerank(
+                stock_recall.top_k(Config.RERANK_TOP_K), news_docs_with_scores
+            )
+        
+        return candidates_text, stock_news_map
+    
+    async def _attach_news(self, keyword: str, final_result: List[Dict], stock_news_map: Dict[str, List[Dict]]) -> List[Dict]:
+        """
+        추천 결과에 관련 뉴스를 추가하고 최종 결과를 캐싱
+        
+        Args:
+            keyword: 검색 키워드
+            final_result: LLM 추천 항목 리스트
+            stock_news_map: 종목 코드별 뉴스 맵
             
-            valid_results.append(rec)
+        Returns:
+            추천 종목 리스트 (배열 형태, 뉴스 포함)
+        """
+        # 5. 뉴스 추가 (스키마 검증은 Structured Output에서 완료, 매핑된 뉴스 우선 사용)
+        valid_results = [self._with_news(rec, stock_news_map) for rec in final_result]
+        
+        # 결과 로그
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("✨ 추천 결과:")
+            for idx, rec in enumerate(valid_results, 1):
+                logger.debug(
+                    "🏆 %d위: %s (%s) | 유사도: %.2f | 관련 뉴스: %d건 | 이유: %s",
+                    idx, rec['name'], rec['code'], rec['similarity'], len(rec['news']), rec['description']
+                )
         
-        # 결과 출력
-        print("✨ 추천 결과:\n")
-        for idx, rec in enumerate(valid_results, 1):
-            print(f"🏆 {idx}위: {rec['name']} ({rec['code']})")
-            print(f"   이유: {rec['description']}")
-            print(f"   유사도: {rec['similarity']:.2f}")
-            print(f"   관련 뉴스: {len(rec['news'])}건\n")
+        # 결과 캐싱 (빈 결과는 일시적 오류일 수 있어 저장하지 않음)
+        if valid_results:
+            await self.cache.aset(keyword, valid_results)
         
         # 배열 형태로 반환
         return valid_results
     
-    def _format_candidates_for_rerank(self, docs_with_scores, news_docs_with_scores=None) -> str:
+    def _with_news(self, rec: Dict, stock_news_map: Dict[str, List[Dict]]) -> Dict:
+        """추천 항목에 관련 뉴스 추가"""
+        # 기존 뉴스 매핑 활용 (속도 최적화)
+        rec['news'] = stock_news_map.get(rec['code'], [])
+        
+        # Fallback: 매핑된 뉴스가 없으면 종목별 뉴스 인덱스 조회 (정확도 보장, DB 조회 X)
+        if not rec['news']:
+            rec['news'] = self.vector_store.get_news_by_stock_code(rec['code'], k=3)
+        return rec
+    
+    async def _rerank(self, keyword: str, stock_recall, news_docs_with_scores) -> str:
+        """
+        Quality 모드: LLM Rerank 후 상위 후보를 Final 프롬프트용 텍스트로 변환
+        
+        Args:
+            keyword: 검색 키워드
+            stock_recall: StockRecall (주식 정보)
+            news_docs_with_scores: (Document, distance) 튜플 리스트 (뉴스 정보)
+            
+        Returns:
+            Rerank 상위 RERANK_TOP_K개 항목의 JSON 문자열
+        """
+        # Rerank 결과는 키워드별로 별도 캐시 (Final 단계가 실패하거나 빈 결과라 최종 결과가 캐시되지 않아도
+        # 재요청 시 Rerank LLM 호출은 생략)
+        cached_rerank = await self.cache.aget(keyword, namespace="rerank")
+        if cached_rerank is not None:
+            logger.debug("⚡ Rerank 캐시 적중")
+            return cached_rerank
+        
+        logger.debug("🔁 LLM Rerank 중...")
+        reranked = await self.rerank_chain.ainvoke({
+            "keyword": keyword,
+            "candidates": self._format_candidates_for_rerank(stock_recall, news_docs_with_scores)
+        })
+        reranked_items = sorted(
+            (item.model_dump() for item in reranked.items),
+            key=lambda item: item["score"],
+            reverse=True
+        )
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("🏁 Rerank Top 10:")
+            for i, item in enumerate(reranked_items[:10], 1):
+                logger.debug(
+                    "  %02d. score=%d | %s(%s) | %s",
+                    i, item['score'], item['stockName'], item['stockCode'], item['evidence']
+                )
+        
+        candidates_text = orjson.dumps({"items": reranked_items[:Config.RERANK_TOP_K]}).decode()
+        if reranked_items:
+            await self.cache.aset(keyword, candidates_text, namespace="rerank")
+        return candidates_text
+    
+    def _format_candidates_for_rerank(self, stock_recall, news_docs_with_scores=None) -> str:
         """
         Rerank를 위한 후보 종목 포맷팅 (뉴스 정보 포함)
         
         Args:
-            docs_with_scores: (Document, distance) 튜플 리스트 (주식 정보)
+            stock_recall: StockRecall (content는 조회 시 이미 잘려 있음)
             news_docs_with_scores: (Document, distance) 튜플 리스트 (뉴스 정보)
             
         Returns:
             포맷된 후보 종목 텍스트
         """
-        # 종목별 뉴스 매핑
-        stock_news_map = {}
+        # 프롬프트 토큰 제한을 위해 distance 상위 RERANK_INPUT_MAX개만 포맷팅
+        if len(stock_recall) > Config.RERANK_INPUT_MAX:
+            stock_recall = stock_recall.top_k(Config.RERANK_INPUT_MAX)
+        
+        # 종목별 뉴스 제목 suffix (뉴스 1개만 포함, 토큰 절약)
+        news_suffix = {}
         if news_docs_with_scores:
             for doc, _ in news_docs_with_scores:
                 code = doc.metadata.get('code')
-                title = doc.metadata.get('title', '')
-                if code not in stock_news_map:
-                    stock_news_map[code] = []
-                if len(stock_news_map[code]) < 1:  # 뉴스 1개만 포함 (토큰 절약)
-                    stock_news_map[code].append(title)
-        
-        parts = []
-        for idx, (doc, distance) in enumerate(docs_with_scores, start=1):
-            m = doc.metadata
-            # 토큰 폭주 방지를 위해 앞부분만 사용
-            content_limit = 120 if Config.FAST_MODE else 200
-            content = doc.page_content[:content_limit]
-            
-            # 뉴스 정보 추가
-            news_section = ""
-            if m['code'] in stock_news_map:
-                news_titles = stock_news_map[m['code']]
-                # 뉴스 제목만 한줄로 추가
-                news_section = f" | 뉴스: {news_titles[0]}"
-            
-            # 중복 제거 (page_content에 이미 종목명/산업이 있으므로 앞부분 헤더 제거)
-            # content 형식이 "종목명: ... 산업: ..." 이므로 그대로 둠
-            parts.append(
-                f"[{idx}] {content} (Code: {m['code']}){news_section}"
-            )
-        return "\n\n".join(parts)
+                if code not in news_suffix:
+                    news_suffix[code] = f" | 뉴스: {doc.metadata.get('title', '')}"
+        
+        # content 형식이 "종목명: ... 산업: ..." 이므로 헤더 없이 그대로 사용
+        return "\n\n".join(
+            f"[{idx}] {content} (Code: {code}){news_suffix.get(code, '')}"
+            for idx, (code, _, _, content, _) in enumerate(stock_recall.candidates(), start=1)
+        )
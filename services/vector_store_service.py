@@ -1,12 +1,88 @@
 """Vector store service for managing ChromaDB"""
-import json
+import argparse
+import asyncio
+import functools
+import hashlib
 import os
-from typing import List, Tuple
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+import chromadb
+import ijson
+import numpy as np
+import openai
+import orjson
 from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
 from langchain_core.documents import Document
+from services.embeddings_cache import CachedEmbeddings
+from utils.rate_limiter import TPMBucket
 from config import Config
-from typing import List, Dict
+
+try:
+    import faiss
+except ImportError:  # faiss 미설치 환경에서는 Chroma로 주식 Recall 수행
+    faiss = None
+
+
+def retry_with_backoff(exceptions, max_attempts: int = 5, base_delay: float = 1.0):
+    """지정한 예외에 대해 지수 백오프(1s, 2s, 4s, ...)로 재시도하는 데코레이터"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(max_attempts):
+                try:
+                    return func(*args, **kwargs)
+                except exceptions:
+                    if attempt == max_attempts - 1:
+                        raise
+                    time.sleep(base_delay * 2 ** attempt)
+        return wrapper
+    return decorator
+
+
+class StockCandidate(NamedTuple):
+    """주식 Recall 결과 (조회 시점에 메타데이터/본문 슬라이스를 한 번만 계산)"""
+    code: str
+    name: str
+    industry: str
+    content: str
+    distance: float
+
+
+@dataclass(frozen=True)
+class StockRecall:
+    """주식 Recall 결과 (병렬 배열: 정렬/마스킹은 numpy로 처리)"""
+    codes: np.ndarray       # dtype=object
+    distances: np.ndarray   # dtype=float32
+    metas: List[Dict]
+    contents: List[str]
+    
+    def __len__(self) -> int:
+        return len(self.codes)
+    
+    def take(self, indices: Sequence[int]) -> "StockRecall":
+        """인덱스 순서대로 부분 Recall 생성"""
+        indices = np.asarray(indices, dtype=np.intp)
+        return StockRecall(
+            codes=self.codes[indices],
+            distances=self.distances[indices],
+            metas=[self.metas[i] for i in indices],
+            contents=[self.contents[i] for i in indices]
+        )
+    
+    def top_k(self, k: int) -> "StockRecall":
+        """distance 오름차순 상위 k개"""
+        return self.take(np.argsort(self.distances, kind="stable")[:k])
+    
+    def candidates(self) -> Iterator[StockCandidate]:
+        """StockCandidate 튜플로 순회"""
+        for code, meta, content, distance in zip(self.codes, self.metas, self.contents, self.distances):
+            yield StockCandidate(code, meta['name'], meta['industry'], content, float(distance))
 
 
 class VectorStoreService:
@@ -15,56 +91,307 @@ class VectorStoreService:
     _instance = None
     _initialized = False
     
-    def __new__(cls):
+    def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super(VectorStoreService, cls).__new__(cls)
         return cls._instance
     
-    def __init__(self):
-        """Initialize vector store (only once)"""
+    def __init__(self, load_news: bool = True, force_reindex: bool = False):
+        """
+        Initialize vector store (only once)
+        
+        Args:
+            load_news: False면 뉴스 컬렉션 적재/인덱스 구축을 생략 (주식 전용 스크립트용).
+                Singleton이므로 프로세스에서 처음 생성할 때의 값만 적용됨
+            force_reindex: True면 기존 컬렉션/적재 완료 표시를 삭제하고 다시 적재.
+                적재 전용 진입점(`python -m services.vector_store_service --force-reindex`)에서만 사용
+                (서버 worker에서 사용하면 worker마다 동시에 컬렉션을 삭제/재적재함)
+        """
         if VectorStoreService._initialized:
             return
             
         print("🔧 Vector Store 초기화 중...")
         
-        # Embeddings 초기화
-        self.embeddings = OpenAIEmbeddings(
-            model=Config.EMBEDDING_MODEL,
-            openai_api_key=Config.OPENAI_API_KEY
+        # Embeddings 초기화 (쿼리 임베딩은 Redis/in-proc 캐시를 거침)
+        self.embeddings = CachedEmbeddings(
+            OpenAIEmbeddings(
+                model=Config.EMBEDDING_MODEL,
+                dimensions=Config.EMBEDDING_DIMENSIONS or None,
+                openai_api_key=Config.OPENAI_API_KEY
+            ),
+            model=f"{Config.EMBEDDING_MODEL}:{Config.EMBEDDING_INDEX_VERSION}"
         )
         
-        # ChromaDB 벡터 스토어 초기화 (주식 정보)
-        self.vectorstore = Chroma(
-            collection_name=Config.CHROMA_COLLECTION_NAME,
-            embedding_function=self.embeddings,
-            persist_directory=Config.CHROMA_DB_PATH,
-            collection_metadata={"hnsw:space": "cosine"}
-        )
+        # 적재 시 임베딩 API TPM 예산 (배치/스레드 간 공유, 예산 소진 시에만 대기)
+        self.embed_bucket = TPMBucket(Config.EMBEDDING_TPM)
+        
+        # ChromaDB 클라이언트 (native 컬렉션으로 적재/조회)
+        self.client = chromadb.PersistentClient(path=Config.CHROMA_DB_PATH)
+        self.max_batch_size = self.client.get_max_batch_size()
+        
+        # 강제 재적재: 기존 컬렉션과 적재 완료 표시를 삭제하여 아래에서 새로 구축
+        if force_reindex:
+            for name in (Config.CHROMA_COLLECTION_NAME, Config.CHROMA_NEWS_COLLECTION_NAME):
+                self._reset_collection(name)
         
-        # 뉴스 벡터 스토어 초기화
-        self.news_vectorstore = Chroma(
-            collection_name=Config.CHROMA_NEWS_COLLECTION_NAME,
-            embedding_function=self.embeddings,
-            persist_directory=Config.CHROMA_DB_PATH,
-            collection_metadata={"hnsw:space": "cosine"}
+        # 기존 컬렉션의 HNSW 설정이 현재 설정과 다르면 갱신 (컬렉션을 열기 전에 수행)
+        self._migrate_hnsw_settings(Config.CHROMA_COLLECTION_NAME)
+        self._migrate_hnsw_settings(Config.CHROMA_NEWS_COLLECTION_NAME)
+        
+        # 주식/뉴스 컬렉션 (임베딩은 직접 계산하여 전달하므로 embedding_function 미사용)
+        self.stocks = self.client.get_or_create_collection(
+            Config.CHROMA_COLLECTION_NAME, metadata=self._collection_metadata()
+        )
+        self.news = self.client.get_or_create_collection(
+            Config.CHROMA_NEWS_COLLECTION_NAME, metadata=self._collection_metadata()
         )
         
-        # 주식 데이터가 없으면 로드
-        if self.vectorstore._collection.count() == 0:
+        # 주식 데이터가 없으면 로드 (적재 완료 표시 파일로 판단, 매 기동마다 count() 조회 생략)
+        if not self._is_loaded(self.stocks):
             print("📊 주식 데이터 로딩 중...")
+            self._begin_loading(self.stocks)
             self._load_stock_data()
+            self._mark_loaded(self.stocks)
         else:
-            print(f"✅ 기존 주식 Vector DB 로드 완료 (총 {self.vectorstore._collection.count()}개 종목)")
+            print("✅ 기존 주식 Vector DB 로드 완료")
         
         # 뉴스 데이터가 없으면 로드
-        if self.news_vectorstore._collection.count() == 0:
-            print("📰 뉴스 데이터 로딩 중...")
-            self._load_news_data()
-        else:
-            print(f"✅ 기존 뉴스 Vector DB 로드 완료 (총 {self.news_vectorstore._collection.count()}개 뉴스)")
+        if load_news:
+            if not self._is_loaded(self.news):
+                print("📰 뉴스 데이터 로딩 중...")
+                self._begin_loading(self.news)
+                self._load_news_data()
+                # 뉴스 파일이 없어 적재하지 못한 경우 다음 기동 시 다시 시도
+                if self.news.count() > 0:
+                    self._mark_loaded(self.news)
+                else:
+                    self._clear_loading(self.news)
+            else:
+                print("✅ 기존 뉴스 Vector DB 로드 완료")
+        
+        # 조회 경로에서 본문(documents)을 읽지 않도록 요약 본문 메타데이터 보장
+        self._ensure_short_metadata()
+        
+        # 주식 Recall용 in-process FAISS HNSW 미러 (Chroma는 적재/메타데이터 원본으로 유지)
+        self.stock_index = None
+        if Config.FAISS_MIRROR and faiss is not None:
+            self._build_stock_mirror()
+        
+        # HNSW 인덱스를 초기화 시점에 미리 로드 (첫 요청에서 인덱스 로딩 지연 방지)
+        # FAISS 미러로 Recall하면 Chroma 주식 인덱스는 조회에 쓰이지 않으므로 로드 생략
+        if self.stock_index is None:
+            self._warm_up_index(self.stocks)
+        
+        # 종목 코드별 뉴스 인덱스 (요청마다 Chroma 조회 대신 dict 조회)
+        self.news_by_code = {}
+        if load_news:
+            self._warm_up_index(self.news)
+            self.refresh_news()
         
         VectorStoreService._initialized = True
     
+    @staticmethod
+    def _sentinel_path(name: str) -> str:
+        """컬렉션 적재 완료 표시 파일 경로"""
+        return os.path.join(Config.CHROMA_DB_PATH, f".{name}_loaded")
+    
+    @staticmethod
+    def _loading_path(name: str) -> str:
+        """컬렉션 적재 진행 중 표시 파일 경로 (적재 도중 중단 여부 판단용)"""
+        return os.path.join(Config.CHROMA_DB_PATH, f".{name}_loading")
+    
+    def _is_loaded(self, collection) -> bool:
+        """
+        컬렉션 적재 완료 여부 (표시 파일 우선)
+        
+        표시 파일 도입 이전에 구축된 DB는 count()로 한 번만 확인한 뒤 표시 파일을 생성.
+        적재 진행 중 표시가 남아 있으면 이전 적재가 중단된 것이므로 count와 무관하게 다시 적재
+        (id가 고정이므로 upsert로 이어서 채움)
+        """
+        if os.path.exists(self._loading_path(collection.name)):
+            print(f"⚠️ '{collection.name}' 이전 적재가 중단됨, 다시 적재")
+            return False
+        if os.path.exists(self._sentinel_path(collection.name)):
+            return True
+        if collection.count() > 0:
+            self._mark_loaded(collection)
+            return True
+        return False
+    
+    def _begin_loading(self, collection):
+        open(self._loading_path(collection.name), "w").close()
+    
+    def _clear_loading(self, collection):
+        loading = self._loading_path(collection.name)
+        if os.path.exists(loading):
+            os.remove(loading)
+    
+    def _mark_loaded(self, collection):
+        open(self._sentinel_path(collection.name), "w").close()
+        self._clear_loading(collection)
+    
+    def _reset_collection(self, name: str):
+        """컬렉션과 적재 완료 표시 파일 삭제 (--force-reindex)"""
+        for marker in (self._sentinel_path(name), self._loading_path(name)):
+            if os.path.exists(marker):
+                os.remove(marker)
+        if name in {getattr(c, "name", c) for c in self.client.list_collections()}:
+            print(f"🗑️ '{name}' 컬렉션 삭제 (강제 재적재)")
+            self.client.delete_collection(name)
+    
+    # 인덱스 구축 시 고정되는 설정 / 조회 시 변경 가능한 설정
+    HNSW_BUILD_KEYS = ("hnsw:M", "hnsw:construction_ef")
+    HNSW_QUERY_KEYS = ("hnsw:search_ef", "hnsw:batch_size", "hnsw:sync_threshold")
+    
+    @staticmethod
+    def _collection_metadata() -> Dict:
+        """
+        컬렉션 생성 시 HNSW 설정 (낮은 K에서도 recall 유지를 위해 ef를 높임)
+        
+        구축 시 설정은 modify에 포함할 수 없으므로 "index:" 키에도 기록하여 마이그레이션 시 비교에 사용
+        
+        Returns:
+            Chroma collection metadata
+        """
+        return {
+            "hnsw:space": "cosine",
+            "hnsw:M": Config.HNSW_M,
+            "hnsw:construction_ef": Config.HNSW_CONSTRUCTION_EF,
+            "hnsw:search_ef": Config.HNSW_SEARCH_EF,
+            "hnsw:batch_size": Config.HNSW_BATCH_SIZE,
+            "hnsw:sync_threshold": Config.HNSW_SYNC_THRESHOLD,
+            "index:M": Config.HNSW_M,
+            "index:construction_ef": Config.HNSW_CONSTRUCTION_EF
+        }
+    
+    def _migrate_hnsw_settings(self, name: str):
+        """
+        기존 컬렉션 HNSW 설정 마이그레이션
+        
+        - search_ef 등 조회 시 설정만 다르면 modify로 즉시 반영
+          (hnsw:space/구축 시 설정은 modify 요청에 넣으면 Chroma가 거부하므로 제외)
+        - M/construction_ef(인덱스 구축 시 고정)가 다르면 저장된 임베딩으로 컬렉션 재구축
+          (임베딩 API 재호출 없음)
+        
+        Args:
+            name: 컬렉션 이름
+        """
+        if name not in {getattr(c, "name", c) for c in self.client.list_collections()}:
+            return
+        
+        collection = self.client.get_collection(name)
+        current = collection.metadata or {}
+        target = self._collection_metadata()
+        
+        # modify 이후에는 hnsw:M 등이 메타데이터에서 빠지므로 "index:" 기록을 함께 확인
+        def build_value(key: str):
+            return current.get(key, current.get(key.replace("hnsw:", "index:")))
+        
+        if any(build_value(key) != target[key] for key in self.HNSW_BUILD_KEYS):
+            self._rebuild_collection(collection, target)
+            return
+        
+        if all(current.get(key) == target[key] for key in self.HNSW_QUERY_KEYS):
+            return
+        
+        print(f"🔧 '{name}' HNSW 조회 설정 갱신 (search_ef={target['hnsw:search_ef']})")
+        excluded = ("hnsw:space",) + self.HNSW_BUILD_KEYS
+        metadata = {key: value for key, value in {**current, **target}.items() if key not in excluded}
+        collection.modify(metadata=metadata)
+        
+        # chroma 1.x는 메타데이터가 아닌 configuration으로 실행 중인 인덱스 설정을 갱신
+        collection.modify(configuration={"hnsw": {
+            "ef_search": target["hnsw:search_ef"],
+            "batch_size": target["hnsw:batch_size"],
+            "sync_threshold": target["hnsw:sync_threshold"]
+        }})
+    
+    def _rebuild_collection(self, collection, target: Dict):
+        """저장된 임베딩으로 새 HNSW 설정의 컬렉션 재구축 (임베딩 API 재호출 없음)"""
+        name = collection.name
+        print(f"🔧 '{name}' HNSW 인덱스 재구축 중 (M={target['hnsw:M']}, construction_ef={target['hnsw:construction_ef']})...")
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        # 재구축 도중 중단되면 다음 기동 시 원본 데이터에서 다시 적재하도록 진행 중 표시
+        self._begin_loading(collection)
+        self.client.delete_collection(name)
+        rebuilt = self.client.create_collection(name, metadata=target)
+        for start in range(0, len(data["ids"]), self.max_batch_size):
+            end = start + self.max_batch_size
+            rebuilt.add(
+                ids=data["ids"][start:end],
+                embeddings=data["embeddings"][start:end],
+                documents=data["documents"][start:end],
+                metadatas=data["metadatas"][start:end]
+            )
+        self._mark_loaded(rebuilt)
+        print(f"✅ '{name}' HNSW 인덱스 재구축 완료 (총 {len(data['ids'])}개)")
+    
+    def _ensure_short_metadata(self):
+        """
+        기존 주식 컬렉션에 metadata["short"]가 없으면 documents에서 한 번만 채움
+        (적재 시점 필드 추가 이전에 구축된 DB 호환용)
+        """
+        sample = self.stocks.get(limit=1, include=["metadatas"])
+        if not sample["ids"] or "short" in sample["metadatas"][0]:
+            return
+        
+        print("🔧 주식 메타데이터에 요약 본문(short) 추가 중...")
+        results = self.stocks.get(include=["metadatas", "documents"])
+        metadatas = [
+            {**metadata, "short": document[:Config.SHORT_CONTENT_LENGTH]}
+            for metadata, document in zip(results["metadatas"], results["documents"])
+        ]
+        for start in range(0, len(metadatas), self.max_batch_size):
+            end = start + self.max_batch_size
+            self.stocks.update(ids=results["ids"][start:end], metadatas=metadatas[start:end])
+        print(f"✅ 요약 본문 추가 완료 (총 {len(metadatas)}개 종목)")
+    
+    def _build_stock_mirror(self):
+        """
+        주식 컬렉션 전체 임베딩으로 FAISS HNSW 인덱스 구축 (메타데이터는 인덱스 id와 병렬 리스트)
+        
+        임베딩을 L2 정규화 후 inner product로 검색하므로 distance = 1 - cosine (Chroma와 동일)
+        """
+        results = self.stocks.get(include=["embeddings", "metadatas"])
+        if not results["ids"]:
+            return
+        
+        vectors = np.ascontiguousarray(results["embeddings"], dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        
+        index = faiss.IndexHNSWFlat(vectors.shape[1], Config.FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = Config.HNSW_CONSTRUCTION_EF
+        index.hnsw.efSearch = Config.HNSW_SEARCH_EF
+        index.add(vectors)
+        
+        self.stock_metas = results["metadatas"]
+        self.stock_codes = np.fromiter((m['code'] for m in self.stock_metas), dtype=object, count=len(self.stock_metas))
+        self.stock_index = index
+        print(f"✅ FAISS 주식 인덱스 구축 완료 (총 {index.ntotal}개 종목)")
+    
+    def _search_stock_mirror(self, query_embedding: np.ndarray, k: int, content_limit: int) -> StockRecall:
+        """FAISS 미러로 주식 Recall (Python 행 단위 처리 없이 배열 인덱싱으로 조립)"""
+        query = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(query)
+        similarities, ids = self.stock_index.search(query, k)
+        
+        valid = ids[0] >= 0
+        ids = ids[0][valid]
+        metas = [self.stock_metas[i] for i in ids]
+        return StockRecall(
+            codes=self.stock_codes[ids],
+            distances=(1.0 - similarities[0][valid]).astype(np.float32),
+            metas=metas,
+            contents=[m.get('short', '')[:content_limit] for m in metas]
+        )
+    
+    @staticmethod
+    def _warm_up_index(collection):
+        """저장된 임베딩 1건으로 조회하여 컬렉션의 HNSW 인덱스를 메모리에 적재"""
+        sample = collection.get(limit=1, include=["embeddings"])
+        if sample["ids"]:
+            collection.query(query_embeddings=[sample["embeddings"][0]], n_results=1)
+    
     def _load_stock_data(self):
         """주식 데이터를 로드하여 벡터 DB 구축"""
         stock_data_path = Config.STOCK_DATA_PATH
@@ -72,172 +399,381 @@ class VectorStoreService:
         if not os.path.exists(stock_data_path):
             raise FileNotFoundError(f"Stock data file not found: {stock_data_path}")
         
-        with open(stock_data_path, "r", encoding="utf-8") as f:
-            stock_texts = json.load(f)
+        with open(stock_data_path, "rb") as f:
+            stock_texts = orjson.loads(f.read())
         
+        ids = []
         texts = []
         metadatas = []
+        seen = set()
         
         for item in stock_texts:
+            # 원본 데이터에 같은 종목이 중복 수록된 경우 첫 항목만 사용 (upsert는 같은 id 중복 불가)
+            if item['code'] in seen:
+                continue
+            seen.add(item['code'])
+            
+            name = item['name']
+            industry = item['industry']
             tags = item.get("tags", [])
             
-            # 종목 정보를 텍스트로 결합
-            combined_content = f"""종목명: {item['name']}
-산업: {item['industry']}
-설명: {item['description']}
-세부내용: {' '.join(item['comments'])}
-연관키워드: {', '.join(tags)}
-""".strip()
+            # 종목 정보를 텍스트로 결합 (줄 단위 join, 멀티라인 f-string 재조합 없음)
+            combined_content = "\n".join((
+                f"종목명: {name}",
+                f"산업: {industry}",
+                f"설명: {item['description']}",
+                f"세부내용: {' '.join(item['comments'])}",
+                f"연관키워드: {', '.join(tags)}"
+            ))
             
+            # 종목 코드를 id로 사용 (재적재 시 upsert로 중복 없이 갱신)
+            ids.append(item['code'])
             texts.append(combined_content)
             
             metadatas.append({
                 "market": item['market'],
                 "code": item['code'],
-                "name": item['name'],
-                "industry": item['industry'],
+                "name": name,
+                "industry": industry,
+                # 조회 시 본문 전체를 읽지 않도록 앞부분만 메타데이터에 보관
+                "short": combined_content[:Config.SHORT_CONTENT_LENGTH],
             })
         
-        # 벡터 DB에 추가
-        self.vectorstore.add_texts(texts=texts, metadatas=metadatas)
+        # 벡터 DB에 추가 (임베딩 미리 계산 → 컬렉션에 직접 add)
+        self._add_with_embeddings(self.stocks, [(ids, texts, metadatas)])
         print(f"✅ Vector DB 구축 완료! (총 {len(texts)}개 종목)")
     
+    @staticmethod
+    def _iter_news(path: str) -> Iterator[Dict]:
+        """뉴스 JSON 배열을 항목 단위로 스트리밍 파싱 (전체 리스트를 메모리에 올리지 않음)"""
+        with open(path, "rb") as f:
+            yield from ijson.items(f, "item")
+    
     def _load_news_data(self):
-        """뉴스 데이터를 로드하여 벡터 DB 구축 (배치 처리)"""
-        import time
-        
+        """뉴스 데이터를 스트리밍으로 읽어 벡터 DB 구축 (배치 단위 병렬 임베딩, 임베딩/적재 파이프라인)"""
         news_data_path = Config.NEWS_DATA_PATH
         
         if not os.path.exists(news_data_path):
             print(f"⚠️ 뉴스 데이터 파일 없음: {news_data_path}")
             return
         
-        with open(news_data_path, "r", encoding="utf-8") as f:
-            news_list = json.load(f)
+        print("📰 뉴스 로딩 시작 (스트리밍 파싱 + 병렬 임베딩)...")
         
-        print(f"📰 총 {len(news_list)}개 뉴스 로딩 시작 (배치 처리)...")
+        # 배치 크기는 Chroma add 상한에 맞춤 (배치 내부는 _embed_parallel이 병렬 요청)
+        self._add_with_embeddings(self.news, self._iter_news_batches(news_data_path, self.max_batch_size))
+        
+        total_loaded = self.news.count()
+        print(f"✅ 뉴스 Vector DB 구축 완료! (총 {total_loaded}개 뉴스)")
+    
+    @staticmethod
+    def _news_id(code: str, link: str) -> str:
+        """
+        (종목 코드, 뉴스 링크) 기반 고정 id (blake2b 128bit, 재적재 시 같은 행은 같은 id)
         
-        # 배치 크기 설정 (rate limit 고려)
-        batch_size = 100
-        total_batches = (len(news_list) + batch_size - 1) // batch_size
+        같은 기사가 언급한 종목마다 별도 행으로 저장되므로 링크만으로는 행을 구분할 수 없음
+        """
+        return hashlib.blake2b(f"{code}\0{link}".encode("utf-8"), digest_size=16).hexdigest()
+    
+    def _iter_news_batches(self, path: str, batch_size: int) -> Iterator[Tuple[List[str], List[str], List[Dict]]]:
+        """뉴스 파일을 batch_size개씩 (id, 임베딩 텍스트, 메타데이터) 배치로 변환"""
+        news_iter = self._iter_news(path)
         
-        for batch_idx in range(0, len(news_list), batch_size):
-            batch_news = news_list[batch_idx:batch_idx + batch_size]
+        while True:
+            batch_news = list(islice(news_iter, batch_size))
+            if not batch_news:
+                break
             
+            ids = []
             texts = []
             metadatas = []
+            seen = set()
             
             for item in batch_news:
+                # 같은 (종목, 링크) 행이 한 배치에 중복되면 upsert가 실패하므로 첫 항목만 사용
+                news_id = self._news_id(item['code'], item['link'])
+                if news_id in seen:
+                    continue
+                seen.add(news_id)
+                
                 # 뉴스 제목과 내용을 결합하여 임베딩
                 # content는 100자로 제한하여 토큰 절약
-                content_preview = item['content'][:100] + "..." if len(item['content']) > 100 else item['content']
+                content = item['content']
+                content_preview = content[:100] + "..." if len(content) > 100 else content
                 
-                combined_content = f"""제목: {item['title']}
-내용: {content_preview}
-종목: {item['name']}
-""".strip()
+                title = item['title']
+                name = item['name']
+                combined_content = "\n".join((
+                    f"제목: {title}",
+                    f"내용: {content_preview}",
+                    f"종목: {name}"
+                ))
                 
+                ids.append(news_id)
                 texts.append(combined_content)
                 
                 metadatas.append({
                     "code": item['code'],
-                    "name": item['name'],
-                    "title": item['title'],
+                    "name": name,
+                    "title": title,
                     "content": content_preview,
                     "link": item['link'],
                     "published_date": item['published_date']
                 })
             
-            # 벡터 DB에 추가
-            current_batch = batch_idx // batch_size + 1
-            print(f"   배치 {current_batch}/{total_batches} 처리 중... ({len(texts)}개 뉴스)")
+            yield ids, texts, metadatas
+    
+    def _embed_parallel(
+        self, 
+        texts: List[str], 
+        batch_size: int = 1000, 
+        workers: int = 8
+    ) -> List[List[float]]:
+        """
+        문서 임베딩을 batch_size 단위로 나누어 스레드 풀에서 병렬 요청 (HTTP 대기 중첩)
+        
+        Args:
+            texts: 임베딩할 문서 리스트
+            batch_size: 요청당 문서 수 (OpenAI 요청당 입력 상한 2048 이하)
+            workers: 동시 요청 수
             
-            try:
-                self.news_vectorstore.add_texts(texts=texts, metadatas=metadatas)
-                
-                # Rate limit 방지를 위해 대기 (마지막 배치는 제외)
-                if batch_idx + batch_size < len(news_list):
-                    time.sleep(2)
-                    
-            except Exception as e:
-                print(f"   ⚠️ 배치 {current_batch} 처리 중 오류: {e}")
-                print(f"   20초 대기 후 재시도...")
-                time.sleep(20)
-                # 재시도
+        Returns:
+            입력 순서와 동일한 임베딩 리스트
+        """
+        # Rate limit/일시적 연결 오류만 백오프 재시도 (DB 적재는 재시도 대상 아님)
+        @retry_with_backoff((openai.RateLimitError, openai.APIConnectionError))
+        def embed_batch(batch: List[str]) -> List[List[float]]:
+            return self.embeddings.embed_documents(batch)
+        
+        def limited_embed_batch(batch: List[str]) -> List[List[float]]:
+            self.embed_bucket.acquire(TPMBucket.estimate_tokens(batch))
+            return embed_batch(batch)
+        
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(limited_embed_batch, batches)
+            return [vector for batch_vectors in results for vector in batch_vectors]
+    
+    def _add_with_embeddings(self, collection, batches: Iterable[Tuple[List[str], List[str], List[Dict]]]):
+        """
+        병렬로 계산한 임베딩과 함께 native 컬렉션에 적재 (LangChain add_texts의 배치별 임베딩 루프 생략)
+        
+        producer 스레드가 배치 N+1을 파싱/임베딩하는 동안 현재 스레드는 배치 N을 Chroma에 적재
+        (큐 크기 2로 메모리에 올라가는 배치 수 제한)
+        
+        Args:
+            collection: 적재할 Chroma 컬렉션
+            batches: (고정 id, 문서 리스트, 문서별 메타데이터) 배치 iterable
+                (id가 고정이므로 재실행/부분 실패 후 재시도 시 중복 없이 upsert)
+        """
+        embedded = queue.Queue(maxsize=2)
+        # 적재(consumer)가 실패/종료하면 producer가 다음 배치 임베딩(API 호출)을 멈추도록 알림
+        stop = threading.Event()
+        
+        def put(item) -> bool:
+            """큐가 가득 차 있으면 stop 여부를 확인하며 대기 (consumer 종료 시 False)"""
+            while not stop.is_set():
                 try:
-                    self.news_vectorstore.add_texts(texts=texts, metadatas=metadatas)
-                except Exception as retry_error:
-                    print(f"   ❌ 재시도 실패: {retry_error}")
-                    print(f"   배치 {current_batch} 건너뜀")
+                    embedded.put(item, timeout=1.0)
+                    return True
+                except queue.Full:
                     continue
+            return False
         
-        total_loaded = self.news_vectorstore._collection.count()
-        print(f"✅ 뉴스 Vector DB 구축 완료! (총 {total_loaded}개 뉴스)")
+        def produce():
+            try:
+                for ids, texts, metadatas in batches:
+                    if stop.is_set() or not put((ids, texts, self._embed_parallel(texts), metadatas)):
+                        return
+                put(None)
+            except Exception as e:
+                put(e)
+            finally:
+                # 중단 시 스트리밍 파서(뉴스 파일 핸들)도 즉시 정리
+                close = getattr(batches, "close", None)
+                if close is not None:
+                    close()
+        
+        threading.Thread(target=produce, name="embed-producer", daemon=True).start()
+        
+        loaded = 0
+        try:
+            while (item := embedded.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                ids, texts, vectors, metadatas = item
+                
+                # Chroma가 허용하는 최대 배치 크기 단위로 upsert (SQLite/HNSW 쓰기 횟수 최소화)
+                for start in range(0, len(texts), self.max_batch_size):
+                    end = start + self.max_batch_size
+                    collection.upsert(
+                        ids=ids[start:end],
+                        embeddings=vectors[start:end],
+                        documents=texts[start:end],
+                        metadatas=metadatas[start:end]
+                    )
+                loaded += len(texts)
+                print(f"   {loaded}개 적재 완료...")
+        finally:
+            stop.set()
+    
+    @functools.lru_cache(maxsize=4096)
+    def embed_query(self, text: str) -> np.ndarray:
+        """
+        쿼리 임베딩 (같은 쿼리는 프로세스 내에서 재사용)
+        
+        Args:
+            text: 임베딩할 쿼리
+            
+        Returns:
+            float32 임베딩 벡터 (캐시 공유되므로 읽기 전용)
+        """
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        vector.setflags(write=False)
+        return vector
     
-    def similarity_search_with_score(
+    @staticmethod
+    def _to_docs_with_scores(results) -> List[Tuple[Document, float]]:
+        """Chroma query 결과를 (Document, distance) 튜플 리스트로 변환 (documents 미포함 시 빈 본문)"""
+        if not results["ids"] or not results["ids"][0]:
+            return []
+        distances = np.asarray(results["distances"][0], dtype=np.float32)
+        documents = (results.get("documents") or [None])[0] or [""] * len(distances)
+        return [
+            (Document(page_content=document, metadata=metadata), float(distance))
+            for document, metadata, distance in zip(
+                documents, results["metadatas"][0], distances
+            )
+        ]
+    
+    def similarity_search_by_vector_with_score(
         self, 
-        query: str, 
-        k: int = 10
-    ) -> List[Tuple[Document, float]]:
+        query_embedding: np.ndarray, 
+        k: int = 10,
+        content_limit: Optional[int] = None
+    ) -> StockRecall:
         """
-        유사도 검색 수행 (주식 정보)
+        임베딩 벡터로 유사도 검색 수행 (주식 정보)
         
         Args:
-            query: 검색 쿼리
+            query_embedding: embed_query()로 계산한 쿼리 임베딩
             k: 반환할 결과 개수
+            content_limit: 본문 길이 제한 (기본: FAST_MODE 120자, 그 외 200자)
             
         Returns:
-            (Document, distance) 튜플의 리스트
+            StockRecall (distance 오름차순)
         """
-        return self.vectorstore.similarity_search_with_score(query, k=k)
+        if content_limit is None:
+            # 토큰 폭주 방지를 위해 앞부분만 사용
+            content_limit = 120 if Config.FAST_MODE else 200
+        
+        if self.stock_index is not None:
+            return self._search_stock_mirror(query_embedding, k, content_limit)
+        
+        # 본문(documents)은 조회하지 않고 적재 시 저장한 metadata["short"]만 사용
+        results = self.stocks.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            include=["metadatas", "distances"]
+        )
+        metas = results["metadatas"][0] if results["ids"] else []
+        return StockRecall(
+            codes=np.fromiter((m['code'] for m in metas), dtype=object, count=len(metas)),
+            distances=np.asarray(results["distances"][0] if metas else [], dtype=np.float32),
+            metas=metas,
+            contents=[m.get('short', '')[:content_limit] for m in metas]
+        )
     
-    def search_news_by_keyword(
+    def search_news_by_vector(
         self, 
-        query: str, 
+        query_embedding: np.ndarray, 
         k: int = 5
     ) -> List[Tuple[Document, float]]:
         """
-        키워드로 뉴스 검색
+        임베딩 벡터로 뉴스 검색
         
         Args:
-            query: 검색 키워드
+            query_embedding: embed_query()로 계산한 쿼리 임베딩
             k: 반환할 뉴스 개수
             
         Returns:
             (Document, distance) 튜플의 리스트
         """
-        return self.news_vectorstore.similarity_search_with_score(query, k=k)
+        # 뉴스는 title/code 등 메타데이터만 사용하므로 본문은 조회하지 않음
+        results = self.news.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            include=["metadatas", "distances"]
+        )
+        return self._to_docs_with_scores(results)
     
-    def search_news_by_stock_code(
-        self, 
-        stock_code: str, 
-        k: int = 5
-    ) -> List[Dict]:
+    def refresh_news(self, per_code: int = 10):
+        """
+        종목 코드 → 최신 뉴스 리스트 인덱스 재구성 (뉴스 적재 후 스케줄러에서 호출)
+        
+        Args:
+            per_code: 종목별 보관할 최대 뉴스 개수
         """
-        종목 코드로 관련 뉴스 검색
+        results = self.news.get(include=["metadatas"])
+        
+        news_by_code = defaultdict(list)
+        for metadata in results.get('metadatas') or []:
+            news_by_code[metadata.get('code')].append({
+                "title": metadata.get('title', ''),
+                "content": metadata.get('content', ''),
+                "link": metadata.get('link', ''),
+                "published_date": metadata.get('published_date', '')
+            })
+        
+        # published_date(ISO 8601) 내림차순 정렬 후 종목별 상위 per_code개만 유지
+        # (구축 완료 후 한 번에 교체하여 재구축 중 동시 요청이 빈/부분 인덱스를 보지 않도록)
+        self.news_by_code = {
+            code: sorted(items, key=lambda item: item['published_date'], reverse=True)[:per_code]
+            for code, items in news_by_code.items()
+        }
+        print(f"✅ 종목별 뉴스 인덱스 구축 완료 (총 {len(self.news_by_code)}개 종목)")
+    
+    def get_news_by_stock_code(self, stock_code: str, k: int = 3) -> List[Dict]:
+        """
+        종목 코드로 최신 뉴스 조회 (메모리 인덱스)
         
         Args:
             stock_code: 종목 코드
             k: 반환할 뉴스 개수
             
         Returns:
-            뉴스 리스트 (메타데이터)
+            뉴스 리스트 (published_date 내림차순)
         """
-        # ChromaDB의 where 필터 사용
-        results = self.news_vectorstore._collection.get(
-            where={"code": stock_code},
-            limit=k
-        )
-        
-        # 메타데이터만 추출 (content는 이미 100자로 제한됨)
-        news_list = []
-        if results and results.get('metadatas'):
-            for metadata in results['metadatas']:
-                news_list.append({
-                    "title": metadata.get('title', ''),
-                    "content": metadata.get('content', ''),
-                    "link": metadata.get('link', ''),
-                    "published_date": metadata.get('published_date', '')
-                })
-        
-        return news_list
+        return self.news_by_code.get(stock_code, [])[:k]
+    
+    # 비동기 래퍼: Chroma 조회는 native 레이어에서 GIL을 해제하므로
+    # 스레드로 넘겨 여러 조회를 동시에 수행할 수 있음 (읽기는 thread-safe)
+    async def aembed_query(self, text: str) -> np.ndarray:
+        """embed_query의 비동기 버전"""
+        return await asyncio.to_thread(self.embed_query, text)
+    
+    async def asimilarity_search_by_vector_with_score(
+        self, 
+        query_embedding: np.ndarray, 
+        k: int = 10
+    ) -> StockRecall:
+        """similarity_search_by_vector_with_score의 비동기 버전"""
+        return await asyncio.to_thread(self.similarity_search_by_vector_with_score, query_embedding, k)
+    
+    async def asearch_news_by_vector(
+        self, 
+        query_embedding: np.ndarray, 
+        k: int = 5
+    ) -> List[Tuple[Document, float]]:
+        """search_news_by_vector의 비동기 버전"""
+        return await asyncio.to_thread(self.search_news_by_vector, query_embedding, k)
+
+
+if __name__ == '__main__':
+    # 컬렉션 적재/HNSW 마이그레이션만 수행하고 종료 (gunicorn 기동 전 1회 실행, Dockerfile 참고)
+    parser = argparse.ArgumentParser(description="ChromaDB 컬렉션 적재/HNSW 마이그레이션")
+    parser.add_argument(
+        "--force-reindex", action="store_true",
+        help="기존 주식/뉴스 컬렉션과 적재 완료 표시를 삭제하고 데이터를 다시 적재"
+    )
+    args = parser.parse_args()
+    VectorStoreService(force_reindex=args.force_reindex)
@@ -1,5 +1,6 @@
 """Utils package for helper functions"""
-from .keyword_synonyms import KEYWORD_SYNONYMS, rule_expand_keyword
+from .keyword_synonyms import KEYWORD_SYNONYMS, normalize_keyword, rule_expand_keyword
 from .query_expander import QueryExpander
+from .rate_limiter import TPMBucket
 
-__all__ = ['KEYWORD_SYNONYMS', 'rule_expand_keyword', 'QueryExpander']
+__all__ = ['KEYWORD_SYNONYMS', 'normalize_keyword', 'rule_expand_keyword', 'QueryExpander', 'TPMBucket']
@@ -1,4 +1,5 @@
 """Keyword synonym mappings for rule-based query expansion"""
+import unicodedata
 from typing import Optional
 
 
@@ -38,6 +39,15 @@ KEYWORD_SYNONYMS = {
 }
 
 
+# 대소문자 무시 조회용 인덱스 (정규화된 키워드 → 원본 키)
+_SYNONYM_KEYS = {key.lower(): key for key in KEYWORD_SYNONYMS}
+
+
+def normalize_keyword(keyword: str) -> str:
+    """캐시/사전 조회용 키워드 정규화 (NFKC + 공백 제거 + 소문자)"""
+    return unicodedata.normalize("NFKC", keyword).strip().lower()
+
+
 def rule_expand_keyword(keyword: str) -> Optional[str]:
     """
     룰 기반 키워드 확장
@@ -48,6 +58,7 @@ def rule_expand_keyword(keyword: str) -> Optional[str]:
     Returns:
         확장된 쿼리 문자열 또는 None (룰이 없는 경우)
     """
-    if keyword in KEYWORD_SYNONYMS:
-        return f"{keyword} / " + " / ".join(KEYWORD_SYNONYMS[keyword])
+    key = keyword if keyword in KEYWORD_SYNONYMS else _SYNONYM_KEYS.get(normalize_keyword(keyword))
+    if key is not None:
+        return f"{key} / " + " / ".join(KEYWORD_SYNONYMS[key])
     return None
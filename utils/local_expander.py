@@ -0,0 +1,118 @@
+"""Local query expansion using a small ONNX sentence encoder (CPU, no LLM call)"""
+import json
+import os
+from typing import List
+import numpy as np
+from .keyword_synonyms import KEYWORD_SYNONYMS
+from config import Config
+
+# 한국어 SBERT 모델 ONNX export (model.onnx + tokenizer.json 생성, optimum[exporters] 필요)
+EXPORT_COMMAND = (
+    "optimum-cli export onnx --model snunlp/KR-SBERT-V40K-klueNLI-augSTS "
+    "--task feature-extraction ./data/ko-sbert"
+)
+
+
+class LocalQueryExpander:
+    """
+    로컬 bi-encoder 기반 쿼리 확장기
+
+    - 금융 키워드 사전(룰/정적 사전 확장어 + 종목명 + 산업명)의 임베딩을 미리 계산
+    - 입력 키워드를 인코딩하여 brute-force cosine(`embeddings @ q`)으로 top-k 확장어 선택
+    """
+
+    def __init__(self, static_map: dict):
+        """
+        Args:
+            static_map: QueryExpander의 정적 확장 사전 (확장어 사전 구성에 사용)
+        """
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError(
+                "USE_LOCAL_EXPANDER=True에는 onnxruntime, tokenizers 패키지가 필요합니다 "
+                "(pip install onnxruntime tokenizers)"
+            ) from e
+
+        model_path = Config.LOCAL_EXPANDER_MODEL_PATH
+        for path in (model_path, Config.LOCAL_EXPANDER_TOKENIZER_PATH):
+            if not os.path.exists(path):
+                raise FileNotFoundError(
+                    f"로컬 확장기 모델 파일이 없습니다: {path}\n"
+                    f"모델을 먼저 export 하세요: {EXPORT_COMMAND}"
+                )
+        self.session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(Config.LOCAL_EXPANDER_TOKENIZER_PATH)
+        self.tokenizer.enable_truncation(max_length=64)
+        self.tokenizer.enable_padding()
+
+        self.top_k = Config.LOCAL_EXPANDER_TOP_K
+        self.words = self._build_vocabulary(static_map)
+        self.word_embeddings = self._load_or_encode_vocabulary(model_path + ".vocab.npz")
+
+    @staticmethod
+    def _build_vocabulary(static_map: dict) -> List[str]:
+        """확장 후보 단어 사전 구성 (중복 제거, 순서 고정)"""
+        words = []
+        for synonyms in KEYWORD_SYNONYMS.values():
+            words.extend(synonyms)
+        for expanded in static_map.values():
+            # "[카테고리] 관련 키워드: a, b, c" 형식에서 키워드만 추출
+            words.extend(w.strip() for w in expanded.split(":", 1)[-1].split(","))
+
+        if os.path.exists(Config.STOCK_DATA_PATH):
+            with open(Config.STOCK_DATA_PATH, "r", encoding="utf-8") as f:
+                for item in json.load(f):
+                    words.append(item['name'])
+                    words.append(item['industry'])
+
+        return list(dict.fromkeys(w for w in words if w))
+
+    def _load_or_encode_vocabulary(self, cache_path: str) -> np.ndarray:
+        """사전 임베딩 로드 (사전이 바뀌었으면 재계산 후 저장)"""
+        if os.path.exists(cache_path):
+            cached = np.load(cache_path, allow_pickle=False)
+            if cached["words"].tolist() == self.words:
+                return cached["embeddings"]
+
+        print(f"🔧 로컬 확장기 사전 임베딩 계산 중... ({len(self.words)}개 단어)")
+        embeddings = np.vstack([
+            self.encode(self.words[i:i + 64]) for i in range(0, len(self.words), 64)
+        ])
+        np.savez(cache_path, words=np.asarray(self.words), embeddings=embeddings)
+        return embeddings
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """문장 임베딩 (mean pooling + L2 정규화, float32)"""
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, feeds)[0]
+
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-9, None)
+        return pooled.astype(np.float32)
+
+    def expand(self, keyword: str) -> str:
+        """
+        키워드 확장: 사전에서 cosine 유사도 top-k 단어를 붙여 반환
+
+        Args:
+            keyword: 입력 키워드
+
+        Returns:
+            "키워드 단어1 단어2 ..." 형태의 확장 쿼리
+        """
+        query = self.encode([keyword])[0]
+        scores = self.word_embeddings @ query
+        top = np.argpartition(-scores, min(self.top_k, len(scores) - 1))[:self.top_k]
+        top = top[np.argsort(-scores[top])]
+        return " ".join([keyword] + [self.words[i] for i in top if self.words[i] != keyword])
@@ -1,16 +1,43 @@
 """Query expansion using LLM for keywords without rule-based synonyms"""
+import functools
+import json
+import logging
+import os
+from typing import List, Optional
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from .keyword_synonyms import rule_expand_keyword
+from .keyword_synonyms import normalize_keyword, rule_expand_keyword
 from config import Config
 
+try:
+    from diskcache import Cache
+except ImportError:  # diskcache 미설치 환경에서는 LLM 확장 결과를 프로세스 메모리에만 캐싱
+    Cache = None
+
+logger = logging.getLogger(__name__)
+
 
 class QueryExpander:
-    """쿼리 확장기: 룰 기반 우선, LLM fallback"""
+    """쿼리 확장기: 룰 기반/정적 사전 우선, 로컬 bi-encoder 또는 LLM fallback"""
+    
+    # 프로세스 내 확장 LRU 크기 (정규화 키 → 원본 표기 맵도 같은 크기로 제한)
+    CACHE_SIZE = 4096
     
     def __init__(self):
         """Initialize LLM-based query expander"""
+        # 정규화 키 → 처음 들어온 원본 표기 (LRU/디스크 캐시 모두 정규화 키 기준이므로 확장에는 같은 표기 사용)
+        self._originals = {}
+        
+        # 금융 키워드 정적 확장 사전 (정규화된 키워드 → 확장 문자열)
+        self.static_map = self._load_static_map(Config.SYNONYMS_PATH)
+        
+        # 로컬 bi-encoder 확장기 (설정 시 LLM 확장 대신 사용)
+        self.local_expander = None
+        if Config.USE_LOCAL_EXPANDER:
+            from .local_expander import LocalQueryExpander
+            self.local_expander = LocalQueryExpander(self.static_map)
+        
         self.llm = ChatOpenAI(
             model=Config.LLM_MODEL,
             temperature=Config.LLM_TEMPERATURE,
@@ -39,6 +66,17 @@ class QueryExpander:
 """)
         
         self.query_expander_chain = self.expand_prompt | self.llm | StrOutputParser()
+        
+        # LLM 확장 결과 디스크 캐시 (재시작 후에도 유지, worker 프로세스 간 공유)
+        self.disk_cache = Cache(Config.QUERY_EXPAND_CACHE_DIR) if Cache is not None else None
+    
+    @staticmethod
+    def _load_static_map(path: str) -> dict:
+        """정적 확장 사전 로드 (파일이 없으면 빈 사전)"""
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return {normalize_keyword(k): v for k, v in json.load(f).items()}
     
     def expand(self, keyword: str) -> str:
         """
@@ -50,14 +88,99 @@ class QueryExpander:
         Returns:
             확장된 쿼리 문자열
         """
-        # 1. 룰 기반 확장 우선
+        key = normalize_keyword(keyword)
+        self._remember_original(key, keyword)
+        return self._expand(key)
+    
+    def expand_many(self, keywords: List[str]) -> List[str]:
+        """
+        여러 키워드 일괄 확장: 룰/사전/캐시 적중은 그대로, LLM이 필요한 키워드만 chain.batch로 동시 호출
+        
+        Args:
+            keywords: 입력 키워드 리스트
+            
+        Returns:
+            입력 순서와 동일한 확장 쿼리 리스트
+        """
+        # 정규화된 키로 중복 제거, 확장에는 처음 들어온 원본 키워드를 사용
+        originals = {}
+        for keyword in keywords:
+            key = normalize_keyword(keyword)
+            originals.setdefault(key, self._remember_original(key, keyword))
+        
+        expanded = {}
+        for key, keyword in originals.items():
+            result = self._expand_without_llm(key, keyword)
+            if result is not None:
+                expanded[key] = result
+        
+        misses = [key for key in originals if key not in expanded]
+        if misses:
+            outputs = self.query_expander_chain.batch(
+                [{"keyword": originals[key]} for key in misses],
+                config={"max_concurrency": 8},
+                return_exceptions=True
+            )
+            for key, output in zip(misses, outputs):
+                if isinstance(output, Exception):
+                    # 실패한 키워드만 원본 키워드로 대체 (캐시하지 않아 다음 요청에서 다시 확장)
+                    logger.warning("⚠️ 쿼리 확장 실패, 원본 키워드 사용: %s (%s)", originals[key], output)
+                    expanded[key] = originals[key]
+                    continue
+                expanded[key] = self._store_llm_expansion(key, output)
+        
+        return [expanded[normalize_keyword(keyword)] for keyword in keywords]
+    
+    def _remember_original(self, key: str, keyword: str) -> str:
+        """정규화 키의 원본 표기 등록 (이미 있으면 처음 등록된 표기 반환)"""
+        if key not in self._originals and len(self._originals) >= self.CACHE_SIZE:
+            self._originals.clear()
+        return self._originals.setdefault(key, keyword)
+    
+    @functools.lru_cache(maxsize=CACHE_SIZE)
+    def _expand(self, key: str) -> str:
+        """
+        정규화 키 기준 키워드 확장 (프로세스 내 LRU 캐시, worker 간 공유는 RecommendationCache)
+        
+        key는 사전/LRU/디스크 캐시 조회용 정규화 키이며, LLM/로컬 확장기에는 해당 키로 처음 들어온
+        원본 표기를 넘김 (예: "NVIDIA"가 먼저 들어오면 "nvidia"도 같은 확장 결과를 공유)
+        """
+        keyword = self._originals.get(key, key)
+        result = self._expand_without_llm(key, keyword)
+        if result is not None:
+            return result
+        
+        # 5. LLM 기반 확장 (fallback)
+        return self._store_llm_expansion(
+            key, self.query_expander_chain.invoke({"keyword": keyword})
+        )
+    
+    def _expand_without_llm(self, key: str, keyword: str) -> Optional[str]:
+        """LLM 호출 없이 확장 가능한 경우의 결과 (없으면 None → LLM 확장 필요)"""
+        # 1. 룰 기반 / 정적 사전 확장 우선
         rule_result = rule_expand_keyword(keyword)
         if rule_result:
             return rule_result
+        
+        if key in self.static_map:
+            return self.static_map[key]
+
+        # 2. 로컬 bi-encoder 확장 (LLM 호출 없이 CPU에서 수 ms)
+        if self.local_expander is not None:
+            return self.local_expander.expand(keyword)
 
-        # 2. 속도 우선 모드에서는 LLM 확장 생략
+        # 3. 속도 우선 모드에서는 LLM 확장 생략
         if Config.FAST_MODE:
             return keyword
         
-        # 3. LLM 기반 확장 (fallback)
-        return self.query_expander_chain.invoke({"keyword": keyword}).strip()
+        # 4. 이전 LLM 확장 결과 (디스크 캐시)
+        if self.disk_cache is not None:
+            return self.disk_cache.get(key)
+        return None
+    
+    def _store_llm_expansion(self, key: str, output: str) -> str:
+        """LLM 확장 결과 정리 후 디스크 캐시에 저장 (프롬프트 변경이 반영되도록 만료 시간 적용)"""
+        expanded = output.strip()
+        if self.disk_cache is not None:
+            self.disk_cache.set(key, expanded, expire=Config.QUERY_EXPAND_CACHE_TTL)
+        return expanded
@@ -0,0 +1,55 @@
+"""Token-bucket rate limiter for embedding API tokens-per-minute budget"""
+import threading
+import time
+from typing import List
+
+
+class TPMBucket:
+    """
+    분당 토큰(TPM) 예산 기반 token bucket (thread-safe)
+
+    - 버킷은 용량(tokens_per_minute)만큼 가득 찬 상태로 시작하고 초당 TPM/60씩 채워짐
+    - acquire()는 토큰이 부족할 때만 필요한 만큼 대기 (고정 sleep 없음)
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        """
+        Args:
+            tokens_per_minute: OpenAI 요금제의 분당 토큰 한도
+        """
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0
+        self.tokens_remaining = float(tokens_per_minute)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int):
+        """
+        토큰 차감 (부족하면 채워질 때까지 대기)
+
+        Args:
+            tokens: 요청에 사용할 예상 토큰 수 (용량 초과 시 용량으로 제한)
+        """
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens_remaining = min(
+                    self.capacity,
+                    self.tokens_remaining + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens_remaining >= tokens:
+                    self.tokens_remaining -= tokens
+                    return
+                # 다른 스레드도 같은 버킷을 기다리므로 lock을 잡은 채 대기하여 순서 보장
+                time.sleep((tokens - self.tokens_remaining) / self.rate)
+
+    @staticmethod
+    def estimate_tokens(texts: List[str]) -> int:
+        """
+        배치 토큰 수 추정 (tokenizer 없이)
+
+        영문은 약 4자/토큰이지만 한글은 1~2자/토큰이므로 보수적으로 2자/토큰으로 계산
+        """
+        return sum(len(text) for text in texts) // 2 + 1